@@ -1,9 +1,13 @@
-from typing import Optional
+import functools
+import inspect
+from typing import Iterable, Iterator, Optional
 
 import click
 
 from .api.choices import ChoicesBlastType, ChoicesTaskBlastn, ChoicesTaskTblastn, ChoicesTaskBlastp, ChoicesTaskBlastx, ChoicesOutfmtDiamond, ChoicesYesNo, ChoicesStrand
 from . import cli
+from .api import blast_request
+from .api.blast_request import SearchJob
 
 
 def __get_required_options(command):
@@ -29,12 +33,35 @@ def __invoke(cli_method, _kwargs):
     return ctx.invoke(cli_method, **_kwargs)
 
 
+def __submit_variant(search_function, cli_method):
+    name = search_function.__name__
+
+    @functools.wraps(search_function)
+    def submit_function(*args, **kwargs):
+        bound_args = inspect.signature(search_function).bind(*args, **kwargs)
+        bound_args.apply_defaults()
+        params = dict(bound_args.arguments)
+        params['calltype'] = 'api'
+        params['handler'] = blast_request.submit
+        return __invoke(cli_method, params)
+
+    submit_function.__name__ = submit_function.__qualname__ = f'submit_{name}'
+    submit_function.__doc__ = search_function.__doc__.replace(
+        f'\n    {name}\n',
+        f'\n    submit_{name}\n\n    non-blocking variant of `{name}()` which returns a `SearchJob` handle right after the Galaxy job has been started\n',
+        1
+    )
+    submit_function.__annotations__ = dict(search_function.__annotations__, **{'return': SearchJob})
+    return submit_function
+
+
 
 
 
 def list_tools(
         server: Optional[str] = 'default',
         type: Optional[ChoicesBlastType | None] = None,
+        refresh: Optional[bool] = False,
     ) -> dict:
     """
     list_tools
@@ -44,6 +71,7 @@ def list_tools(
     Arguments:
         server: Server-ID
         type: limit the list to a specific tool type (blastn, tblast, blastp, blastx, diamond)
+        refresh: fetch the list from the Galaxy server instead of using the cached catalog
     """
     params = locals()
     params['calltype'] = 'api'
@@ -53,7 +81,8 @@ def list_tools(
 
 def list_dbs(
         tool: str,
-        server: Optional[str] = 'default'
+        server: Optional[str] = 'default',
+        refresh: Optional[bool] = False,
     ) -> dict:
     """
     list_dbs
@@ -63,6 +92,7 @@ def list_dbs(
     Arguments:
         server: Server-ID
         tool: Tool-ID
+        refresh: fetch the list from the Galaxy server instead of using the cached catalog
     """
     params = locals()
     params['calltype'] = 'api'
@@ -77,7 +107,7 @@ def blastn(
         query: str = '',
         query_str: str = None,
         task: Optional[ChoicesTaskBlastn] = ChoicesTaskBlastn.megablast,
-        db: Optional[str | None] = None,
+        db: Optional[str | list[str] | None] = None,
         evalue: Optional[str] = '0.001',
         out: str = '',
         outfmt: Optional[str] = '6',
@@ -92,7 +122,14 @@ def blastn(
         qcov_hsp_perc: Optional[float] = 0.0,
         window_size: Optional[int | None] = None,
         gapopen: Optional[int | None] = None,
-        gapextend: Optional[int | None] = None
+        gapextend: Optional[int | None] = None,
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
     ):
     """
     blastn
@@ -104,9 +141,9 @@ def blastn(
         query: file path with your query sequence
         query_str: Python string containing the query sequence, can be used instead of `query` param
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a list (or comma-separated string) of databases which are searched concurrently
         evalue: Expectation value cutoff
-        out: Path / filename of file to store the BLAST result
+        out: Path / filename of file to store the BLAST result, the result is then streamed to this file and its path is returned
         outfmt: Output format
         html: Format output as HTML document
         dust: Filter out low complexity regions (with DUST)
@@ -120,6 +157,13 @@ def blastn(
         window_size: Multiple hits window size: use 0 to specify 1-hit algorithm, leave blank for default
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['calltype'] = 'api'
@@ -132,7 +176,7 @@ def tblastn(
         query: str = '',
         query_str: str = None,
         task: Optional[ChoicesTaskTblastn] = ChoicesTaskTblastn.tblastn,
-        db: Optional[str] = None,
+        db: Optional[str | list[str]] = None,
         evalue: Optional[str] = '0.001',
         out: str = '',
         outfmt: Optional[str] = '6',
@@ -153,6 +197,13 @@ def tblastn(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '2',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
     ):
     """
     tblastn
@@ -164,9 +215,9 @@ def tblastn(
         query: file path with your query sequence
         query_str: Python string containing the query sequence, can be used instead of `query` param
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a list (or comma-separated string) of databases which are searched concurrently
         evalue: Expectation value cutoff
-        out: Path / filename of file to store the BLAST result
+        out: Path / filename of file to store the BLAST result, the result is then streamed to this file and its path is returned
         outfmt: Output format
         html: Format output as HTML document
         seg: Filter out low complexity regions (with SEG)
@@ -185,6 +236,13 @@ def tblastn(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['calltype'] = 'api'
@@ -198,7 +256,7 @@ def blastp(
         query: str = '',
         query_str: str = None,
         task: Optional[ChoicesTaskBlastp] = ChoicesTaskBlastp.blastp,
-        db: Optional[str] = None,
+        db: Optional[str | list[str]] = None,
         evalue: Optional[str] = '0.001',
         out: str = '',
         outfmt: Optional[str] = '6',
@@ -218,7 +276,14 @@ def blastp(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '2',
-        use_sw_tback: Optional[bool] = False
+        use_sw_tback: Optional[bool] = False,
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
     ):
     """
     blastp
@@ -230,9 +295,9 @@ def blastp(
         query: file path with your query sequence
         query_str: Python string containing the query sequence, can be used instead of `query` param
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a list (or comma-separated string) of databases which are searched concurrently
         evalue: Expectation value cutoff
-        out: Path / filename of file to store the BLAST result
+        out: Path / filename of file to store the BLAST result, the result is then streamed to this file and its path is returned
         outfmt: Output format
         html: Format output as HTML document
         seg: Filter out low complexity regions (with SEG)
@@ -251,6 +316,13 @@ def blastp(
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
         use_sw_tback: Compute locally optimal Smith-Waterman alignments?
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['calltype'] = 'api'
@@ -263,7 +335,7 @@ def blastx(
         query: str = '',
         query_str: str = None,
         task: Optional[ChoicesTaskBlastx] = ChoicesTaskBlastx.blastx,
-        db: Optional[str] = None,
+        db: Optional[str | list[str]] = None,
         evalue: Optional[str] = '0.001',
         out: str = '',
         outfmt: Optional[str] = '6',
@@ -283,6 +355,13 @@ def blastx(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '2',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
     ):
     """
     blastx
@@ -294,9 +373,9 @@ def blastx(
         query: file path with your query sequence
         query_str: Python string containing the query sequence, can be used instead of `query` param
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a list (or comma-separated string) of databases which are searched concurrently
         evalue: Expectation value cutoff
-        out: Path / filename of file to store the BLAST result
+        out: Path / filename of file to store the BLAST result, the result is then streamed to this file and its path is returned
         outfmt: Output format
         html: Format output as HTML document
         seg: Filter out low complexity regions (with SEG)
@@ -314,6 +393,13 @@ def blastx(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['calltype'] = 'api'
@@ -327,7 +413,7 @@ def diamond_blastp(
         query: str = '',
         query_str: str = None,
         task: Optional[ChoicesTaskBlastp] = ChoicesTaskBlastp.blastp,
-        db: Optional[str] = None,
+        db: Optional[str | list[str]] = None,
         evalue: Optional[str] = '0.001',
         #out: str = '',
         outfmt: Optional[ChoicesOutfmtDiamond] = ChoicesOutfmtDiamond.blast_pairwise.value,
@@ -346,6 +432,13 @@ def diamond_blastp(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '1',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
     ):
     """
     diamond_blastp
@@ -357,7 +450,7 @@ def diamond_blastp(
         query: file path with your query sequence
         query_str: Python string containing the query sequence, can be used instead of `query` param
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a list (or comma-separated string) of databases which are searched concurrently
         evalue: Expectation value cutoff
         outfmt: Output format
         faster: faster mode
@@ -375,6 +468,13 @@ def diamond_blastp(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['calltype'] = 'api'
@@ -389,7 +489,7 @@ def diamond_blastx(
         query: str = '',
         query_str: str = None,
         task: Optional[ChoicesTaskBlastp] = ChoicesTaskBlastp.blastp,
-        db: Optional[str] = None,
+        db: Optional[str | list[str]] = None,
         evalue: Optional[str] = '0.001',
         out: str = '',
         outfmt: Optional[ChoicesOutfmtDiamond] = ChoicesOutfmtDiamond.blast_pairwise.value,
@@ -408,6 +508,13 @@ def diamond_blastx(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '1',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
     ):
     """
     diamond_blastx
@@ -419,9 +526,9 @@ def diamond_blastx(
         query: file path with your query sequence
         query_str: Python string containing the query sequence, can be used instead of `query` param
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a list (or comma-separated string) of databases which are searched concurrently
         evalue: Expectation value cutoff
-        out: Path / filename of file to store the BLAST result
+        out: Path / filename of file to store the BLAST result, the result is then streamed to this file and its path is returned
         outfmt: Output format
         faster: faster mode
         fast: fast mode
@@ -438,6 +545,13 @@ def diamond_blastx(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['calltype'] = 'api'
@@ -445,4 +559,71 @@ def diamond_blastx(
 
 
 
-__all__ = ['list_tools', 'list_dbs', 'blastn', 'tblastn', 'blastp', 'blastx', 'diamond_blastp', 'diamond_blastx']
\ No newline at end of file
+submit_blastn = __submit_variant(blastn, cli.blastn)
+submit_tblastn = __submit_variant(tblastn, cli.tblastn)
+submit_blastp = __submit_variant(blastp, cli.blastp)
+submit_blastx = __submit_variant(blastx, cli.blastx)
+submit_diamond_blastp = __submit_variant(diamond_blastp, cli.diamond_blastp)
+submit_diamond_blastx = __submit_variant(diamond_blastx, cli.diamond_blastx)
+
+
+
+def status(job: SearchJob) -> str:
+    """
+    status
+
+    get the current Galaxy state of a submitted search (e.g. `queued`, `running`, `ok` or `error`)
+
+    Arguments:
+        job: a job handle returned by one of the `submit_*` functions
+    """
+    return blast_request.job_status(job)
+
+
+
+def wait(job: SearchJob, timeout: Optional[float] = None) -> str:
+    """
+    wait
+
+    wait until a submitted search has reached a terminal state and return that state
+
+    Arguments:
+        job: a job handle returned by one of the `submit_*` functions
+        timeout: maximum number of seconds to wait, raises a `Blast2galaxyError` when exceeded
+    """
+    return blast_request.wait_for_job(job, timeout=timeout)
+
+
+
+def collect(job: SearchJob):
+    """
+    collect
+
+    wait for a submitted search to finish and return its result like the blocking search functions do
+
+    Arguments:
+        job: a job handle returned by one of the `submit_*` functions
+    """
+    return blast_request.collect(job)
+
+
+
+def as_completed(jobs: Iterable[SearchJob], interval: Optional[float] = 1) -> Iterator[SearchJob]:
+    """
+    as_completed
+
+    iterate over submitted searches in the order in which they finish
+
+    Arguments:
+        jobs: job handles returned by the `submit_*` functions
+        interval: seconds to wait before the second status check of the pending jobs, the interval grows up to 30 seconds while jobs are running. The states of all jobs of a history are checked with a single request.
+    """
+    return blast_request.as_completed(jobs, interval=interval)
+
+
+
+__all__ = [
+    'list_tools', 'list_dbs', 'blastn', 'tblastn', 'blastp', 'blastx', 'diamond_blastp', 'diamond_blastx',
+    'submit_blastn', 'submit_tblastn', 'submit_blastp', 'submit_blastx', 'submit_diamond_blastp', 'submit_diamond_blastx',
+    'status', 'wait', 'collect', 'as_completed', 'SearchJob'
+]
\ No newline at end of file
@@ -0,0 +1,430 @@
+"""
+asyncio API of blast2galaxy
+
+Provides awaitable equivalents of the search and listing functions of the blast2galaxy Python API.
+All requests of an event loop share one HTTP connection pool, so many searches can run concurrently
+without blocking the event loop or needing a thread per search.
+
+Requires the optional dependency `aiohttp` (`pip install blast2galaxy[aio]`).
+"""
+import asyncio
+import functools
+import inspect
+import io
+import time
+import weakref
+from typing import Optional
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError('The asyncio API of blast2galaxy requires the optional dependency `aiohttp`. Install it with `pip install blast2galaxy[aio]`.') from e
+
+import click
+
+import blast2galaxy
+from . import cache
+from . import cli
+from . import config
+from . import errors
+from .api import blast_request
+from .api import poller
+from .api import server_info
+from .api import throughput
+from .api.choices import ChoicesBlastType
+from .utils import get_value, iter_fasta_records, iter_query_ids, merge_ranked_results, split_fasta
+
+
+# maximum number of simultaneously open connections of the shared connection pool
+CONNECTION_LIMIT = 100
+
+DATASET_TERMINAL_STATES = {'ok', 'empty', 'error', 'discarded', 'failed_metadata'}
+
+
+_sessions = weakref.WeakKeyDictionary()
+
+# IDs of the blast2galaxy histories by server URL and API key, shared by all clients of the process
+_history_ids = {}
+
+
+
+def _get_session():
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(connector = aiohttp.TCPConnector(limit = CONNECTION_LIMIT))
+        _sessions[loop] = session
+    return session
+
+
+
+async def close():
+    """
+    close the shared HTTP connection pool of the running event loop
+    """
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+
+
+class AsyncGalaxyClient:
+    """
+    Minimal asynchronous client for the Galaxy API endpoints used by blast2galaxy
+    """
+    def __init__(self, server_config):
+        if not server_config.get('api_key'):
+            raise errors.Blast2galaxyConfigFileError(f'The asyncio API requires an `api_key` for the Galaxy server {server_config.get("server_url")}.')
+
+        self.base_url = str(server_config['server_url']).rstrip('/')
+        self.url = f'{self.base_url}/api'
+        self.headers = {'x-api-key': str(server_config['api_key'])}
+
+    async def _request(self, method, url, raw = False, **kwargs):
+        session = _get_session()
+        try:
+            async with session.request(method, url, headers = self.headers, **kwargs) as response:
+                if response.status >= 400:
+                    body = await response.text()
+                    raise errors.Blast2galaxyError(f'Galaxy API request {method} {url} failed with HTTP status {response.status}: {body}')
+                if raw:
+                    return await response.read()
+                return await response.json(content_type = None)
+        except aiohttp.ClientError as e:
+            raise errors.Blast2galaxyError(f'Could not connect to Galaxy server: {self.base_url} ({e})')
+
+    async def get_history_id(self, history_name = 'blast2galaxy', refresh = False):
+        history_key = (self.base_url, self.headers['x-api-key'], history_name)
+        if not refresh and history_key in _history_ids:
+            return _history_ids[history_key]
+
+        _history_ids[history_key] = await self._find_or_create_history(history_name)
+        return _history_ids[history_key]
+
+    async def _find_or_create_history(self, history_name):
+        histories = await self._request('GET', f'{self.url}/histories', params = {'keys': 'id,name'})
+        histories = [h for h in histories if h['name'] == history_name]
+        if histories:
+            return histories[0]['id']
+        history = await self._request('POST', f'{self.url}/histories', json = {'name': history_name})
+        return history['id']
+
+    async def paste_content(self, content, history_id, file_name):
+        payload = {
+            'history_id': history_id,
+            'tool_id': 'upload1',
+            'inputs': {
+                'file_type': 'auto',
+                'dbkey': '?',
+                'files_0|type': 'upload_dataset',
+                'files_0|NAME': file_name,
+                'files_0|url_paste': content
+            }
+        }
+        return await self._request('POST', f'{self.url}/tools', json = payload)
+
+    async def run_tool(self, history_id, tool_id, tool_inputs):
+        payload = {
+            'history_id': history_id,
+            'tool_id': tool_id,
+            'input_format': 'legacy',
+            'inputs': tool_inputs.to_dict()
+        }
+        return await self._request('POST', f'{self.url}/tools', json = payload)
+
+    async def wait_for_dataset(self, dataset_id, interval = poller.MIN_POLL_INTERVAL):
+        while True:
+            dataset = await self._request('GET', f'{self.url}/datasets/{dataset_id}')
+            if dataset['state'] in DATASET_TERMINAL_STATES:
+                return dataset
+            await asyncio.sleep(interval)
+            # datasets of long running jobs are polled less and less often
+            interval = poller.next_interval(interval)
+
+    async def download_dataset(self, dataset_id):
+        dataset = await self.wait_for_dataset(dataset_id)
+        if dataset['state'] != 'ok':
+            raise errors.Blast2galaxyError(f'The result dataset {dataset_id} is in state `{dataset["state"]}`.')
+
+        file_ext = dataset.get('file_ext')
+        if not file_ext or file_ext in ['auto', '_sniff_']:
+            file_ext = 'data'
+
+        return await self._request('GET', f'{self.base_url}{dataset["download_url"]}', raw = True, params = {'to_ext': file_ext})
+
+    async def delete_dataset(self, history_id, dataset_id, purge = False):
+        url = f'{self.url}/histories/{history_id}/contents/{dataset_id}'
+        return await self._request('DELETE', url, json = {'purge': True} if purge else {})
+
+    async def get_tools(self):
+        return await self._request('GET', f'{self.url}/tools', params = {'in_panel': 'False'})
+
+    async def show_tool(self, tool_id, io_details = False):
+        return await self._request('GET', f'{self.url}/tools/{tool_id}', params = {'io_details': str(io_details)})
+
+
+
+async def _upload_query(client, history_id, query, file_name):
+    try:
+        paste_content_result = await client.paste_content(query, history_id, file_name)
+    except errors.Blast2galaxyError:
+        # the remembered history may have been deleted in the meantime, look it up again and retry once
+        history_id = await client.get_history_id(refresh = True)
+        paste_content_result = await client.paste_content(query, history_id, file_name)
+
+    return history_id, paste_content_result['outputs'][0]['id']
+
+
+
+async def _run_search(client, history_id, tool_id, params, query, file_name):
+    history_id, dataset_id_query = await _upload_query(client, history_id, query, file_name)
+
+    tool_inputs = blast_request._get_tool_inputs(params, dataset_id_query)
+
+    run_tool_result = await client.run_tool(history_id, str(tool_id), tool_inputs)
+    dataset_id_result = run_tool_result['outputs'][0]['id']
+
+    try:
+        return await client.download_dataset(dataset_id_result)
+    finally:
+        # clean up history
+        await asyncio.gather(
+            client.delete_dataset(history_id, dataset_id_query, purge = True),
+            client.delete_dataset(history_id, dataset_id_result, purge = True)
+        )
+
+
+
+async def _run_chunked_search(client, history_id, tool_id, params, query):
+    if params['outfmt'] in blast_request.NON_MERGEABLE_OUTFMTS or params.get('html'):
+        raise errors.Blast2galaxyError(f'The output format `{params["outfmt"]}` can not be merged and is therefore not supported for chunked searches.')
+
+    if params.get('chunk_runtime'):
+        return await _run_adaptive_search(client, history_id, tool_id, params, query)
+
+    chunks = split_fasta(query, max_sequences = params.get('chunk_size'), max_residues = params.get('chunk_residues'))
+    semaphore = asyncio.Semaphore(params.get('parallel_jobs') or 1)
+
+    async def run_chunk(chunk_index):
+        async with semaphore:
+            file_name = f'blast2galaxy_query_{params["tool"]}_chunk{chunk_index + 1}.fasta'
+            return await _run_search(client, history_id, tool_id, params, chunks[chunk_index], file_name)
+
+    chunk_results = await asyncio.gather(*[run_chunk(i) for i in range(len(chunks))])
+    return b''.join(chunk_results)
+
+
+
+async def _run_adaptive_search(client, history_id, tool_id, params, query):
+    throughput_key = throughput.get_throughput_key(client.base_url, tool_id, params['db'])
+    chunker = throughput.AdaptiveChunker(
+        iter_fasta_records(query),
+        throughput_key,
+        target_runtime = params['chunk_runtime'],
+        initial_residues = params.get('chunk_residues'),
+        max_sequences = params.get('chunk_size')
+    )
+    chunk_results = {}
+
+    async def run_chunks():
+        # each worker cuts its next chunk only when it is free, so that the chunk is sized by the latest throughput
+        while (next_chunk := chunker.next_chunk()) is not None:
+            chunk, chunk_residues = next_chunk
+            chunk_index = len(chunk_results)
+            chunk_results[chunk_index] = None
+            file_name = f'blast2galaxy_query_{params["tool"]}_chunk{chunk_index + 1}.fasta'
+            start_time = time.monotonic()
+            chunk_results[chunk_index] = await _run_search(client, history_id, tool_id, params, chunk, file_name)
+            throughput.throughput_stats.record(throughput_key, chunk_residues, time.monotonic() - start_time)
+
+    try:
+        await asyncio.gather(*[run_chunks() for _ in range(params.get('parallel_jobs') or 1)])
+    finally:
+        throughput.throughput_stats.save()
+
+    return b''.join(chunk_results[chunk_index] for chunk_index in range(len(chunk_results)))
+
+
+
+async def _run_multi_db_search(client, history_id, tool_id, params, query):
+    databases = blast_request._get_databases(params)
+
+    file_name = f'blast2galaxy_query_{params["tool"]}.fasta'
+    history_id, dataset_id_query = await _upload_query(client, history_id, query, file_name)
+
+    semaphore = asyncio.Semaphore(params.get('parallel_jobs') or 1)
+
+    async def run_database(database):
+        async with semaphore:
+            tool_inputs = blast_request._get_tool_inputs(dict(params, db = database), dataset_id_query)
+            run_tool_result = await client.run_tool(history_id, str(tool_id), tool_inputs)
+            dataset_id_result = run_tool_result['outputs'][0]['id']
+            try:
+                return io.BytesIO(await client.download_dataset(dataset_id_result))
+            finally:
+                await client.delete_dataset(history_id, dataset_id_result, purge = True)
+
+    try:
+        result_files = await asyncio.gather(*[run_database(database) for database in databases])
+    finally:
+        await client.delete_dataset(history_id, dataset_id_query, purge = True)
+
+    f_result = io.BytesIO()
+    merge_ranked_results(result_files, databases, iter_query_ids(query), f_result)
+    return f_result.getvalue()
+
+
+
+async def _request(params):
+    if config.get_profile_group(params['profile']) is not None:
+        raise errors.Blast2galaxyError('Profile groups are not supported by the asyncio API, use the blocking search functions instead.')
+
+    profile = config.get_profile(profile=params['profile'])
+    client = AsyncGalaxyClient(profile)
+
+    blast_request._prepare_databases(params)
+
+    query = blast_request._read_query(params)
+    query, query_fanout = blast_request._deduplicate_query(params, query)
+
+    result_cache, cache_key = blast_request._get_result_cache_key(params, profile, query)
+    blast_result = blast_request._get_cached_result(params, result_cache, cache_key)
+    if blast_result is not None:
+        return blast_request._process_result(params, blast_request._fan_out(query_fanout, blast_result))
+
+    history_id = await client.get_history_id()
+
+    if blast_request._is_multi_db(params):
+        blast_result = await _run_multi_db_search(client, history_id, profile['tool'], params, query)
+    elif blast_request._is_chunked(params):
+        blast_result = await _run_chunked_search(client, history_id, profile['tool'], params, query)
+    else:
+        file_name = f'blast2galaxy_query_{params["tool"]}.fasta'
+        blast_result = await _run_search(client, history_id, profile['tool'], params, query, file_name)
+
+    if result_cache is not None:
+        result_cache.put(cache_key, blast_result)
+
+    return blast_request._process_result(params, blast_request._fan_out(query_fanout, blast_result))
+
+
+
+def _resolve_params(search_function, cli_method, args, kwargs):
+    """
+    resolve the arguments of a search function to the request parameters built by its CLI command
+    """
+    bound_args = inspect.signature(search_function).bind(*args, **kwargs)
+    bound_args.apply_defaults()
+    _kwargs = dict(bound_args.arguments)
+    _kwargs['calltype'] = 'api'
+    _kwargs['handler'] = lambda params: params
+    ctx = click.Context(cli_method)
+    return ctx.invoke(cli_method, **_kwargs)
+
+
+
+def _async_variant(search_function, cli_method):
+    name = search_function.__name__
+
+    @functools.wraps(search_function)
+    async def async_search_function(*args, **kwargs):
+        params = _resolve_params(search_function, cli_method, args, kwargs)
+        return await _request(params)
+
+    async_search_function.__doc__ = search_function.__doc__.replace(
+        f'\n    {name}\n',
+        f'\n    {name}\n\n    awaitable variant of `blast2galaxy.{name}()`\n',
+        1
+    )
+    return async_search_function
+
+
+
+blastn = _async_variant(blast2galaxy.blastn, cli.blastn)
+tblastn = _async_variant(blast2galaxy.tblastn, cli.tblastn)
+blastp = _async_variant(blast2galaxy.blastp, cli.blastp)
+blastx = _async_variant(blast2galaxy.blastx, cli.blastx)
+diamond_blastp = _async_variant(blast2galaxy.diamond_blastp, cli.diamond_blastp)
+diamond_blastx = _async_variant(blast2galaxy.diamond_blastx, cli.diamond_blastx)
+
+
+
+async def list_tools(
+        server: Optional[str] = 'default',
+        type: Optional[ChoicesBlastType | None] = None,
+        refresh: Optional[bool] = False,
+    ) -> dict:
+    """
+    list_tools
+
+    awaitable variant of `blast2galaxy.list_tools()`
+
+    list available and compatible BLAST+ and DIAMOND tools installed on a Galaxy server
+
+    Arguments:
+        server: Server-ID
+        type: limit the list to a specific tool type (blastn, tblast, blastp, blastx, diamond)
+        refresh: fetch the list from the Galaxy server instead of using the cached catalog
+    """
+    blast_type = get_value(type)
+    server_info._check_blast_type(blast_type)
+
+    server_config = config.get_profile(server=server)
+
+    blast_tools_databases_dict = None if refresh else cache.load_catalog(server_config['server_url'])
+
+    if blast_tools_databases_dict is None:
+        client = AsyncGalaxyClient(server_config)
+
+        tools = await client.get_tools()
+        blast_tool_ids, tool_name_by_tool_id = server_info._select_compatible_tools(tools)
+
+        semaphore = asyncio.Semaphore(server_info.get_max_parallel_requests(server_config))
+
+        async def show_tool(tool_id):
+            async with semaphore:
+                return await client.show_tool(tool_id, io_details=True)
+
+        blast_tools_details = await asyncio.gather(*[show_tool(tool_id) for tool_id in blast_tool_ids])
+
+        blast_tools_databases_dict = {
+            blast_tool_id: {
+                'tool_name': tool_name_by_tool_id[blast_tool_id],
+                'version': blast_tool_details['version'],
+                'available_databases': server_info._get_tool_databases(blast_tool_details)
+            }
+            for blast_tool_id, blast_tool_details in zip(blast_tool_ids, blast_tools_details)
+        }
+        cache.store_catalog(server_config['server_url'], blast_tools_databases_dict)
+
+    return server_info._filter_by_blast_type(blast_tools_databases_dict, blast_type)
+
+
+
+async def list_dbs(
+        tool: str,
+        server: Optional[str] = 'default',
+        refresh: Optional[bool] = False,
+    ) -> dict:
+    """
+    list_dbs
+
+    awaitable variant of `blast2galaxy.list_dbs()`
+
+    list available databases of a BLAST+ or DIAMOND tool installed on a Galaxy server
+
+    Arguments:
+        server: Server-ID
+        tool: Tool-ID
+        refresh: fetch the list from the Galaxy server instead of using the cached catalog
+    """
+    blast_tools_databases_dict = await list_tools(server = server, refresh = refresh)
+
+    if tool not in blast_tools_databases_dict:
+        raise errors.Blast2galaxyError(f'A tool with ID `{tool}` does not exist on the Galaxy server `{server}`.')
+
+    return blast_tools_databases_dict[tool]['available_databases']
+
+
+
+__all__ = ['list_tools', 'list_dbs', 'blastn', 'tblastn', 'blastp', 'blastx', 'diamond_blastp', 'diamond_blastx', 'close']
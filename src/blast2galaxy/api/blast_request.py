@@ -1,11 +1,30 @@
+import io
+import os
+import gzip
 import sys
 import json
-
+import time
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from pathlib import Path
+
+from bioblend import ConnectionError, TimeoutException
+from bioblend.galaxy.datasets import TERMINAL_STATES as DATASET_TERMINAL_STATES
 from bioblend.galaxy.tools.inputs import inputs
 
-from ..utils import parse_tabular_to_list_of_dict
+from ..utils import TabularJsonWriter, get_value, iter_fasta_records, iter_query_ids, iter_tabular_hits, merge_ranked_results, parse_tabular_to_list_of_dict, split_fasta
+from .. import cache
+from .. import columnar
 from .. import config
+from .. import dedup
 from .. import errors
+from . import poller
+from . import scheduler
+from . import throughput
+from ..columnar import COLUMNAR_OUTFMTS
 
 
 DEBUG = False
@@ -27,6 +46,29 @@ diamond_outfmt_fields = [
 ]
 
 
+# output formats which are converted from the tabular result (outfmt 6)
+JSON_OUTFMTS = ['json', 'ndjson']
+TABULAR_CONVERTED_OUTFMTS = JSON_OUTFMTS + COLUMNAR_OUTFMTS + ['pandas']
+
+# output formats whose results can not simply be concatenated when a query is split into chunks
+NON_MERGEABLE_OUTFMTS = ['5', '100', '101']
+
+# size in bytes of the pieces in which results are downloaded and written
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# query files of at least this size in bytes are streamed from disk and uploaded compressed instead of being pasted
+STREAMED_UPLOAD_THRESHOLD = 8 * 1024 * 1024
+
+# size in bytes of the pieces in which query files are compressed and uploaded
+UPLOAD_CHUNK_SIZE = 10 * 1024 * 1024
+
+# HTTP status codes with which Galaxy rejects uploads into a history that no longer exists
+HISTORY_GONE_STATUS_CODES = [400, 403, 404]
+
+# maximum number of seconds to wait for the result of a search job
+MAX_WAIT = 12000
+
+
 
 def _set_blast_adv_opts(params, tool_inputs):
 
@@ -90,7 +132,7 @@ def _get_blast_outfmt(params):
     if params['html']:
         outfmt = outfmt + ' -html'
 
-    if params['outfmt'] == 'json':
+    if params['outfmt'] in TABULAR_CONVERTED_OUTFMTS:
         outfmt = '6'
 
     return outfmt
@@ -100,13 +142,20 @@ def _get_blast_outfmt(params):
 def _get_diamond_outfmt(params):
     outfmt = params['outfmt']
 
-    if params['outfmt'] == 'json':
+    if params['outfmt'] in TABULAR_CONVERTED_OUTFMTS:
         outfmt = '6'
 
     return outfmt
 
 
 
+def _get_galaxy_outfmt(params):
+    if params['tool'] in ['diamond_blastp', 'diamond_blastx']:
+        return _get_diamond_outfmt(params)
+    return _get_blast_outfmt(params)
+
+
+
 def _get_diamond_sensitivity(params):
     sensitivity = None
 
@@ -192,45 +241,76 @@ def _get_diamond_tool_inputs(params, tool_inputs):
 
 
 
-def request(params):
+def _read_query(params, stream_large_files = False):
+    """
+    returns the query as string, or with `stream_large_files=True` the path of query files
+    larger than `STREAMED_UPLOAD_THRESHOLD` which are then uploaded without being read into memory
+    """
+    if 'query_str' in params['kwargs'] and params['kwargs']['query_str']:
+        # use string provided by `query_str` parameter (only in API mode)
+        return params['kwargs']['query_str']
 
-    IS_API_CALL = True if 'calltype' in params['kwargs'] and params['kwargs']['calltype'] == 'api' else False
-    JSON_OUTPUT = True if params['outfmt'] == 'json' else False
-    
-    gi = config.get_galaxy_instance(profile=params['profile'])
+    # use file provided by `query` parameter
+    try:
+        query_path = Path(str(params['query']))
+        if stream_large_files and query_path.stat().st_size >= STREAMED_UPLOAD_THRESHOLD:
+            return query_path
 
-    profile = config.get_profile(profile=params['profile'])
+        with open(query_path) as f:
+            return f.read()
+    except Exception as e:
+        raise errors.Blast2galaxyError(f'File `{params["query"]}` provided via parameter --query could not be opened or even does not exist! ({e})')
 
-    if 'query_str' in params['kwargs'] and params['kwargs']['query_str']:
-        # use string provided by `query_str` parameter (only in API mode)
-        query = params['kwargs']['query_str']
-    else:
-        # use file provided by `query` parameter
-        try:
-            with open(params['query']) as f:
-                query = ''.join(f.readlines())
-        except Exception as e:
-            raise errors.Blast2galaxyError(f'File `{params["query"]}` provided via parameter --query could not be opened or even does not exist! ({e})')
 
 
+def _deduplicate_query(params, query):
+    """
+    with `dedup` returns the query without duplicate sequences and the fan-out of the results onto the original queries,
+    otherwise the unchanged query and None
+    """
+    if not params.get('dedup'):
+        return query, None
+
+    if _get_galaxy_outfmt(params) != '6':
+        raise errors.Blast2galaxyError('Deduplication of queries is only supported for the tabular output formats (6, json, ndjson, arrow, parquet, pandas).')
+
+    # reverse complements are searched as well by blastn on both strands
+    collapse_reverse_complements = params['tool'] == 'blastn' and get_value(params.get('strand')) == 'both'
+
+    return dedup.deduplicate_fasta(query, collapse_reverse_complements = collapse_reverse_complements)
+
+
+
+def _fan_out(query_fanout, blast_result):
+    if query_fanout is None:
+        return blast_result
+    return query_fanout.rewrite(blast_result)
+
+
+
+def _get_history_id(gi, refresh = False):
+    """
+    returns the ID of the history used by blast2galaxy, creating it if necessary.
+    The ID is remembered by pooled sessions and only looked up again when `refresh=True`.
+    """
     history_name = 'blast2galaxy'
-    histories = gi.histories.get_histories(name = history_name)
-    if not histories:
-        gi.histories.create_history(name = history_name)
-        histories = gi.histories.get_histories(name = history_name)
+    history_ids = getattr(gi, 'history_ids', {})
 
-    history_id = histories[0]['id']
+    if not refresh and history_name in history_ids:
+        return history_ids[history_name]
 
-    file_name = f'blast2galaxy_query_{params["tool"]}.fasta'
+    histories = gi.histories.get_histories(name = history_name, keys = ['id', 'name'])
+    if histories:
+        history_id = histories[0]['id']
+    else:
+        history_id = gi.histories.create_history(name = history_name)['id']
+
+    history_ids[history_name] = history_id
+    return history_id
 
-    paste_content_result = gi.tools.paste_content(
-        content = query,
-        history_id = history_id,
-        file_name = file_name
-    )
-    dataset_id_query = paste_content_result['outputs'][0]['id']
 
 
+def _get_tool_inputs(params, dataset_id_query):
     tool_inputs = inputs().set_dataset_param('query', dataset_id_query, src='hda')
 
     if params['tool'] in ['diamond_blastp', 'diamond_blastx']:
@@ -238,30 +318,529 @@ def request(params):
     else:
         tool_inputs = _get_blast_tool_inputs(params, tool_inputs)
 
-
-
     if DEBUG:
         tool_inputs_dict = tool_inputs.to_dict()
         print(json.dumps(tool_inputs_dict, indent=4))
 
+    return tool_inputs
+
+
+
+def _compress_file(path, f_gz):
+    with open(path, 'rb') as f_in, gzip.GzipFile(fileobj = f_gz, mode = 'wb', compresslevel = 6) as f_out:
+        shutil.copyfileobj(f_in, f_out, UPLOAD_CHUNK_SIZE)
+
+
+
+def _upload_query(gi, history_id, query, file_name):
+    """
+    upload a query into a history. Query strings are pasted, query files (`Path`) are gzip-compressed
+    piece by piece into a temporary file which is sent with Galaxy's chunked and resumable (tus) upload.
+    """
+    if not isinstance(query, Path):
+        return gi.tools.paste_content(
+            content = query,
+            history_id = history_id,
+            file_name = file_name
+        )
+
+    fd, gz_path = tempfile.mkstemp(prefix = 'blast2galaxy_query_', suffix = '.fasta.gz')
+    try:
+        with os.fdopen(fd, 'wb') as f_gz:
+            _compress_file(query, f_gz)
+
+        return gi.tools.upload_file(
+            gz_path,
+            history_id,
+            file_name = file_name,
+            auto_decompress = True,
+            chunk_size = UPLOAD_CHUNK_SIZE
+        )
+    finally:
+        Path(gz_path).unlink(missing_ok = True)
+
+
+
+def _upload_query_into_history(gi, history_id, query, file_name):
+    """
+    upload a query, returns the IDs of the history and the query dataset
+    """
+    try:
+        upload_result = _upload_query(gi, history_id, query, file_name)
+    except ConnectionError as e:
+        if e.status_code not in HISTORY_GONE_STATUS_CODES:
+            raise
+        # the remembered history may have been deleted in the meantime, look it up again and retry once
+        history_id = _get_history_id(gi, refresh = True)
+        upload_result = _upload_query(gi, history_id, query, file_name)
+
+    return history_id, upload_result['outputs'][0]['id']
+
+
+
+def _start_tool(gi, history_id, tool_id, params, dataset_id_query):
+    """
+    start the tool on an uploaded query, returns the IDs of the result dataset and the job
+    """
+    tool_inputs = _get_tool_inputs(params, dataset_id_query)
 
     try:
         run_tool_result = gi.tools.run_tool(
             history_id = history_id,
-            tool_id = str(profile['tool']),
+            tool_id = str(tool_id),
             tool_inputs = tool_inputs
         )
     except Exception as e:
         raise e
 
     dataset_id_result = run_tool_result['outputs'][0]['id']
-    blast_result = gi.datasets.download_dataset(dataset_id_result)
+    job_id = run_tool_result['jobs'][0]['id'] if run_tool_result.get('jobs') else None
+
+    return dataset_id_result, job_id
+
+
+
+def _submit_search(gi, history_id, tool_id, params, query, file_name):
+    """
+    upload a query and start the tool on it,
+    returns the IDs of the history, the query dataset, the result dataset and the job
+    """
+    history_id, dataset_id_query = _upload_query_into_history(gi, history_id, query, file_name)
+    dataset_id_result, job_id = _start_tool(gi, history_id, tool_id, params, dataset_id_query)
+
+    return history_id, dataset_id_query, dataset_id_result, job_id
+
+
+
+def _download_dataset(gi, history_id, dataset_id, f_out):
+    """
+    wait for a dataset to be ready and write its content piece by piece to a binary file object
+    """
+    try:
+        state = poller.get_dataset_poller(gi).wait(history_id, dataset_id, timeout = MAX_WAIT)
+    except TimeoutException:
+        raise errors.Blast2galaxyError(f'The result dataset {dataset_id} was not ready within {MAX_WAIT} seconds.')
+    if state != 'ok':
+        raise errors.Blast2galaxyError(f'The result dataset {dataset_id} is in state `{state}`.')
+
+    dataset = gi.datasets.show_dataset(dataset_id)
+
+    file_ext = dataset.get('file_ext')
+    if not file_ext or file_ext in ['auto', '_sniff_']:
+        file_ext = 'data'
+
+    r = gi.make_get_request(f'{gi.base_url}{dataset["download_url"]}', params = {'to_ext': file_ext}, stream = True)
+    with r:
+        r.raise_for_status()
+        for chunk in r.iter_content(chunk_size = DOWNLOAD_CHUNK_SIZE):
+            if chunk:
+                f_out.write(chunk)
+
+
+
+def _collect_search(gi, history_id, dataset_id_query, dataset_id_result, f_out):
+    """
+    wait for a submitted search, write its result to a binary file object and clean up the history
+    """
+    _download_dataset(gi, history_id, dataset_id_result, f_out)
+
+    # clean up history
+    gi.histories.delete_dataset(history_id = history_id, dataset_id = dataset_id_query, purge = True)
+    gi.histories.delete_dataset(history_id = history_id, dataset_id = dataset_id_result, purge = True)
+
+
+
+def _run_search(gi, history_id, tool_id, params, query, file_name, f_out):
+    """
+    upload a query, run the tool on it and write the result to a binary file object
+    """
+    history_id, dataset_id_query, dataset_id_result, _ = _submit_search(gi, history_id, tool_id, params, query, file_name)
+    _collect_search(gi, history_id, dataset_id_query, dataset_id_result, f_out)
+
+
+
+def _get_databases(params):
+    """
+    returns the list of databases of a search, `db` can be a comma-separated string or (API only) a list
+    """
+    databases = params['db']
+    if isinstance(databases, str):
+        databases = databases.split(',')
+    return [str(database).strip() for database in databases if str(database).strip()]
+
+
+
+def _is_multi_db(params):
+    return len(_get_databases(params)) > 1
+
+
+
+def _prepare_databases(params):
+    """
+    check whether the search can be run in the given databases, a single database is normalized to a string
+    """
+    databases = _get_databases(params)
+    if not databases:
+        raise errors.Blast2galaxyError('No database to search in was given.')
+
+    if len(databases) == 1:
+        params['db'] = databases[0]
+        return
+
+    if _get_galaxy_outfmt(params) != '6':
+        raise errors.Blast2galaxyError('Searches in several databases are only supported for the tabular output formats (6, json, ndjson, arrow, parquet, pandas).')
+
+    if _is_chunked(params):
+        raise errors.Blast2galaxyError('Searches in several databases can not be combined with splitting the query into chunks.')
+
+
+
+def _iter_query_ids(query):
+    if not isinstance(query, Path):
+        yield from iter_query_ids(query)
+        return
+
+    with open(query) as f:
+        yield from iter_query_ids(f)
+
+
+
+def _run_multi_db_search(gi, history_id, tool_id, params, query, f_out):
+    """
+    upload a query once, search it concurrently in several databases
+    and write the merged results ranked by e-value and bit score to a binary file object
+    """
+    databases = _get_databases(params)
+
+    file_name = f'blast2galaxy_query_{params["tool"]}.fasta'
+    history_id, dataset_id_query = _upload_query_into_history(gi, history_id, query, file_name)
+
+    def run_database(database):
+        dataset_id_result, _ = _start_tool(gi, history_id, tool_id, dict(params, db = database), dataset_id_query)
+        # results are spooled to temporary files until all databases have been searched
+        result_file = tempfile.TemporaryFile()
+        try:
+            _download_dataset(gi, history_id, dataset_id_result, result_file)
+        except errors.Blast2galaxyError:
+            result_file.close()
+            raise
+        except Exception as e:
+            result_file.close()
+            raise errors.Blast2galaxyError(f'Search in database `{database}` failed: {e}')
+        gi.histories.delete_dataset(history_id = history_id, dataset_id = dataset_id_result, purge = True)
+        result_file.seek(0)
+        return result_file
+
+    max_workers = min(params.get('parallel_jobs') or 1, len(databases))
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        result_files = list(executor.map(run_database, databases))
+
+    gi.histories.delete_dataset(history_id = history_id, dataset_id = dataset_id_query, purge = True)
+
+    try:
+        merge_ranked_results(result_files, databases, _iter_query_ids(query), f_out)
+    finally:
+        for result_file in result_files:
+            result_file.close()
+
 
 
+def _is_chunked(params):
+    return bool(params.get('chunk_size') or params.get('chunk_residues') or params.get('chunk_runtime'))
+
+
+
+def _check_mergeable(params):
+    if params['outfmt'] in NON_MERGEABLE_OUTFMTS or params.get('html'):
+        raise errors.Blast2galaxyError(f'The output format `{params["outfmt"]}` can not be merged and is therefore not supported for chunked searches.')
+
+
+
+def _split_query(params, query):
+    if not _is_chunked(params):
+        return [query]
+    return split_fasta(query, max_sequences = params.get('chunk_size'), max_residues = params.get('chunk_residues'))
+
+
+
+def _write_chunk_results(params, chunks, run_chunk_search, max_workers, f_out):
+    """
+    search the chunks of a query concurrently with `run_chunk_search(chunk, file_name, chunk_file)`
+    and write their results in query order to a binary file object
+    """
+    def run_chunk(chunk_index):
+        file_name = f'blast2galaxy_query_{params["tool"]}_chunk{chunk_index + 1}.fasta'
+        # results of chunks are spooled to temporary files until all previous chunks have been written
+        chunk_file = tempfile.TemporaryFile()
+        try:
+            run_chunk_search(chunks[chunk_index], file_name, chunk_file)
+        except errors.Blast2galaxyError:
+            chunk_file.close()
+            raise
+        except Exception as e:
+            chunk_file.close()
+            raise errors.Blast2galaxyError(f'Search of query chunk {chunk_index + 1} of {len(chunks)} failed: {e}')
+        return chunk_file
+
+    with ThreadPoolExecutor(max_workers = min(max_workers, len(chunks))) as executor:
+        for chunk_file in executor.map(run_chunk, range(len(chunks))):
+            with chunk_file:
+                chunk_file.seek(0)
+                shutil.copyfileobj(chunk_file, f_out, DOWNLOAD_CHUNK_SIZE)
+
+
+
+def _run_adaptive_search(gi, history_id, tool_id, params, query, f_out):
+    """
+    search a multi-FASTA query in chunks as concurrent Galaxy jobs, sizing each chunk by the throughput
+    observed for the previous jobs so that it runs about `chunk_runtime` seconds, and write the merged
+    results in query order to a binary file object
+    """
+    throughput_key = throughput.get_throughput_key(gi.base_url, tool_id, params['db'])
+    chunker = throughput.AdaptiveChunker(
+        iter_fasta_records(query),
+        throughput_key,
+        target_runtime = params['chunk_runtime'],
+        initial_residues = params.get('chunk_residues'),
+        max_sequences = params.get('chunk_size')
+    )
+
+    def run_chunk(chunk_index, chunk, chunk_residues):
+        file_name = f'blast2galaxy_query_{params["tool"]}_chunk{chunk_index + 1}.fasta'
+        # results of chunks are spooled to temporary files until all previous chunks have been written
+        chunk_file = tempfile.TemporaryFile()
+        try:
+            start_time = time.monotonic()
+            _run_search(gi, history_id, tool_id, params, chunk, file_name, chunk_file)
+            throughput.throughput_stats.record(throughput_key, chunk_residues, time.monotonic() - start_time)
+        except errors.Blast2galaxyError:
+            chunk_file.close()
+            raise
+        except Exception as e:
+            chunk_file.close()
+            raise errors.Blast2galaxyError(f'Search of query chunk {chunk_index + 1} failed: {e}')
+        return chunk_file
+
+    max_workers = params.get('parallel_jobs') or 1
+    # futures of the running and finished chunks in query order
+    pending = deque()
+    chunk_count = 0
+
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        try:
+            while True:
+                # chunks are only cut when a job slot is free so that they are sized by the latest throughput
+                while sum(not future.done() for future in pending) < max_workers:
+                    next_chunk = chunker.next_chunk()
+                    if next_chunk is None:
+                        break
+                    pending.append(executor.submit(run_chunk, chunk_count, *next_chunk))
+                    chunk_count += 1
+
+                if not pending:
+                    break
+
+                wait(pending, return_when = FIRST_COMPLETED)
+                while pending and pending[0].done():
+                    with pending.popleft().result() as chunk_file:
+                        chunk_file.seek(0)
+                        shutil.copyfileobj(chunk_file, f_out, DOWNLOAD_CHUNK_SIZE)
+        finally:
+            for future in pending:
+                future.cancel()
+            throughput.throughput_stats.save()
+
+
+
+def _run_chunked_search(gi, history_id, tool_id, params, query, f_out):
+    """
+    split a multi-FASTA query into chunks, search them as concurrent Galaxy jobs
+    and write the merged results in query order to a binary file object
+    """
+    _check_mergeable(params)
+
+    if params.get('chunk_runtime'):
+        return _run_adaptive_search(gi, history_id, tool_id, params, query, f_out)
+
+    chunks = _split_query(params, query)
+    if len(chunks) < 2:
+        return _run_search(gi, history_id, tool_id, params, query, f'blast2galaxy_query_{params["tool"]}.fasta', f_out)
+
+    def run_chunk_search(chunk, file_name, chunk_file):
+        _run_search(gi, history_id, tool_id, params, chunk, file_name, chunk_file)
+
+    _write_chunk_results(params, chunks, run_chunk_search, params.get('parallel_jobs') or 1, f_out)
+
+
+
+def _run_scheduled_search(profile_group, params, query, f_out):
+    """
+    split a multi-FASTA query into chunks and spread them over the servers of a profile group
+    according to the weights and the maximum number of parallel jobs of the servers
+    """
+    _check_mergeable(params)
+
+    chunks = _split_query(params, query)
+    server_scheduler = scheduler.ServerScheduler(profile_group, default_max_parallel_jobs = params.get('parallel_jobs') or 1)
+
+    def run_chunk_search(chunk, file_name, chunk_file):
+        failed_servers = []
+        while True:
+            server = server_scheduler.acquire(exclude = failed_servers)
+            try:
+                gi = config.get_galaxy_instance(profile = server.profile_id)
+                history_id = _get_history_id(gi)
+                _run_search(gi, history_id, server.profile['tool'], params, chunk, file_name, chunk_file)
+                return
+            except Exception:
+                failed_servers.append(server)
+                if len(failed_servers) == len(server_scheduler.servers):
+                    raise
+                # try the chunk again on another server of the group
+                chunk_file.seek(0)
+                chunk_file.truncate()
+            finally:
+                server_scheduler.release(server)
+
+    _write_chunk_results(params, chunks, run_chunk_search, server_scheduler.max_parallel_jobs, f_out)
+
+
+
+def _is_api_call(params):
+    return 'calltype' in params['kwargs'] and params['kwargs']['calltype'] == 'api'
+
+
+
+def _streams_to_output(params):
+    """
+    whether the result can be written to the output piece by piece instead of being returned as a whole
+    """
+    return not (_is_api_call(params) and not params['out'])
+
+
+
+@contextmanager
+def _converted_output(params, f_out):
+    """
+    context manager yielding a binary file object which converts the tabular result to the requested output format on the fly
+    """
+    if params['outfmt'] == 'pandas':
+        raise errors.Blast2galaxyError('The output format `pandas` can only be returned by the Python API and not be written to a file.')
+
+    if params['outfmt'] in COLUMNAR_OUTFMTS:
+        # columnar formats are converted block by block once the tabular result is complete
+        with tempfile.TemporaryFile() as f_tabular:
+            yield f_tabular
+            f_tabular.seek(0)
+            columnar.write_tabular(f_tabular, f_out, params['outfmt'], with_db = _is_multi_db(params))
+        return
+
+    if params['outfmt'] not in JSON_OUTFMTS:
+        yield f_out
+        return
+
+    json_writer = TabularJsonWriter(f_out, ndjson = params['outfmt'] == 'ndjson')
+    yield json_writer
+    json_writer.close()
+
+
+
+@contextmanager
+def _fanout_output(f_out, query_fanout):
+    """
+    context manager yielding a binary file object which rewrites the results of deduplicated queries onto all original queries
+    """
+    if query_fanout is None:
+        yield f_out
+        return
+
+    fanout_writer = dedup.FanoutWriter(f_out, query_fanout)
+    yield fanout_writer
+    fanout_writer.close()
+
+
+
+@contextmanager
+def _open_output(params):
+    """
+    context manager yielding the binary output of a search (stdout or the file given with `out`).
+    A result file is written under a temporary name and only replaces the file given with `out` when the search succeeded.
+    """
+    if params['out'] is None or params['out'] == '':
+        sys.stdout.flush()
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+        return
+
+    out_path = Path(str(params['out']))
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir = out_path.parent, prefix = f'.{out_path.name}.', suffix = '.part')
+    except Exception as e:
+        raise errors.Blast2galaxyError(f'Could not save the result to this file: {str(params["out"])} ({e})')
+
+    try:
+        with os.fdopen(fd, 'wb') as f_out:
+            yield f_out
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok = True)
+        raise
+
+
+
+class _TeeWriter:
+    def __init__(self, *files):
+        self.files = files
+
+    def write(self, data):
+        for f in self.files:
+            f.write(data)
+        return len(data)
+
+
+
+@contextmanager
+def _result_writer(f_out, result_cache, cache_key):
+    """
+    context manager yielding a binary file object which writes to `f_out` and, if enabled, to the result cache
+    """
+    if result_cache is None:
+        yield f_out
+        return
+
+    with result_cache.writer(cache_key) as f_cache:
+        yield _TeeWriter(f_out, f_cache)
+
+
+
+def _process_columnar_result(params, blast_result):
+    if _is_api_call(params) and not params['out']:
+        table = columnar.read_tabular(blast_result, with_db = _is_multi_db(params))
+        return table.to_pandas() if params['outfmt'] == 'pandas' else table
+
+    with _open_output(params) as f_output, _converted_output(params, f_output) as f_out:
+        f_out.write(blast_result)
+
+    if _is_api_call(params):
+        return str(params['out'])
+
+
+
+def _process_result(params, blast_result):
+
+    if params['outfmt'] in COLUMNAR_OUTFMTS + ['pandas']:
+        return _process_columnar_result(params, blast_result)
+
+    IS_API_CALL = _is_api_call(params)
+    JSON_OUTPUT = True if params['outfmt'] == 'json' else False
+    NDJSON_OUTPUT = True if params['outfmt'] == 'ndjson' else False
+
     blast_result_output = ''
     WRITE_AS_BYTES = False
     if JSON_OUTPUT:
         blast_result_output = json.dumps(parse_tabular_to_list_of_dict(blast_result), indent = 4)
+    elif NDJSON_OUTPUT:
+        blast_result_output = ''.join(json.dumps(hit) + '\n' for hit in iter_tabular_hits(blast_result))
     else:
         try:
             blast_result_output = blast_result.decode('utf-8')
@@ -270,12 +849,8 @@ def request(params):
             blast_result_output = blast_result
 
 
-    # clean up history
-    gi.histories.delete_dataset(history_id = history_id, dataset_id = dataset_id_query, purge = True)
-    gi.histories.delete_dataset(history_id = history_id, dataset_id = dataset_id_result, purge = True)
-
     # proceed with result
-    if IS_API_CALL:
+    if IS_API_CALL and not params['out']:
         return blast_result_output
 
     elif params['out'] is None or params['out'] == '':
@@ -293,3 +868,268 @@ def request(params):
 
         except Exception as e:
             raise errors.Blast2galaxyError(f'Could not save the result to this file: {str(params["out"])} ({e})')
+
+        if IS_API_CALL:
+            return str(params['out'])
+
+
+
+def _get_result_cache_key(params, profile, query):
+    """
+    returns the result cache and the cache key of a search, or (None, None) if the cache is disabled or bypassed
+    """
+    if params.get('no_cache'):
+        return None, None
+
+    result_cache = cache.get_result_cache()
+    if result_cache is None:
+        return None, None
+
+    cache_key = cache.make_result_key(profile['server_url'], profile['tool'], _get_galaxy_outfmt(params), params, query)
+    return result_cache, cache_key
+
+
+
+def _get_cached_result(params, result_cache, cache_key):
+    if result_cache is None or params.get('refresh_cache'):
+        return None
+    return result_cache.get(cache_key)
+
+
+
+def _get_profile(params):
+    """
+    returns the profile of a search, and the profiles of the group if `profile` is the ID of a profile group
+    """
+    profile_group = config.get_profile_group(params['profile'])
+    if profile_group is None:
+        return config.get_profile(profile=params['profile']), None
+
+    profile = {
+        'server_url': f'profile_group:{params["profile"]}',
+        'tool': ','.join(sorted(set(str(group_profile['tool']) for group_profile in profile_group.values())))
+    }
+    return profile, profile_group
+
+
+
+def _search(params, profile, query, f_out, result_cache = None, cache_key = None, profile_group = None):
+    """
+    run a search on the Galaxy server of the profile (or the servers of the profile group) and write its result to a binary file object
+    """
+    if profile_group is not None:
+        with _result_writer(f_out, result_cache, cache_key) as f_result:
+            _run_scheduled_search(profile_group, params, query, f_result)
+        return
+
+    gi = config.get_galaxy_instance(profile=params['profile'])
+
+    history_id = _get_history_id(gi)
+
+    with _result_writer(f_out, result_cache, cache_key) as f_result:
+        if _is_multi_db(params):
+            _run_multi_db_search(gi, history_id, profile['tool'], params, query, f_result)
+        elif _is_chunked(params):
+            _run_chunked_search(gi, history_id, profile['tool'], params, query, f_result)
+        else:
+            file_name = f'blast2galaxy_query_{params["tool"]}.fasta'
+            _run_search(gi, history_id, profile['tool'], params, query, file_name, f_result)
+
+
+
+def request(params):
+
+    profile, profile_group = _get_profile(params)
+
+    _prepare_databases(params)
+    if profile_group is not None and _is_multi_db(params):
+        raise errors.Blast2galaxyError('Searches in several databases can not be run with a profile group.')
+    if profile_group is not None and params.get('chunk_runtime'):
+        raise errors.Blast2galaxyError('Adaptive chunk sizing with `chunk_runtime` is not supported for profile groups, use `chunk_size` or `chunk_residues` instead.')
+
+    stream_large_files = not _is_chunked(params) and not params.get('dedup') and profile_group is None
+    query = _read_query(params, stream_large_files = stream_large_files)
+    query, query_fanout = _deduplicate_query(params, query)
+
+    result_cache, cache_key = _get_result_cache_key(params, profile, query)
+
+    if not _streams_to_output(params):
+        # the result is returned or converted as a whole
+        blast_result = _get_cached_result(params, result_cache, cache_key)
+        if blast_result is None:
+            f_result = io.BytesIO()
+            _search(params, profile, query, f_result, result_cache, cache_key, profile_group)
+            blast_result = f_result.getvalue()
+        return _process_result(params, _fan_out(query_fanout, blast_result))
+
+    cached_result_path = None
+    if result_cache is not None and not params.get('refresh_cache'):
+        cached_result_path = result_cache.get_path(cache_key)
+
+    with (
+        _open_output(params) as f_output,
+        _converted_output(params, f_output) as f_converted,
+        _fanout_output(f_converted, query_fanout) as f_out
+    ):
+        if cached_result_path is not None:
+            with open(cached_result_path, 'rb') as f_cached:
+                shutil.copyfileobj(f_cached, f_out, DOWNLOAD_CHUNK_SIZE)
+        else:
+            _search(params, profile, query, f_out, result_cache, cache_key, profile_group)
+
+    if _is_api_call(params):
+        return str(params['out'])
+
+
+
+class SearchJob:
+    """
+    Handle of a search that has been submitted to a Galaxy server with one of the `submit_*` functions
+
+    Attributes:
+        tool: the search tool (e.g. `blastn` or `diamond_blastp`)
+        history_id: ID of the Galaxy history the search runs in
+        dataset_id_query: ID of the uploaded query dataset
+        dataset_id_result: ID of the result dataset
+        job_id: ID of the Galaxy job
+    """
+    def __init__(self, gi, params, history_id, dataset_id_query, dataset_id_result, job_id, result_cache = None, cache_key = None, cached_result = None, query_fanout = None):
+        self._gi = gi
+        self._query_fanout = query_fanout
+        self._result_cache = result_cache
+        self._cache_key = cache_key
+        self._cached_result = cached_result
+        self.params = params
+        self.tool = params['tool']
+        self.history_id = history_id
+        self.dataset_id_query = dataset_id_query
+        self.dataset_id_result = dataset_id_result
+        self.job_id = job_id
+        self.collected = False
+
+    def __repr__(self):
+        return f'SearchJob(tool={self.tool!r}, job_id={self.job_id!r}, dataset_id_result={self.dataset_id_result!r})'
+
+
+
+def submit(params):
+    """
+    upload the query and start the search without waiting for its result
+    """
+    if _is_chunked(params):
+        raise errors.Blast2galaxyError('Chunked searches can not be submitted as a single job, use the blocking search functions instead.')
+
+    if config.get_profile_group(params['profile']) is not None:
+        raise errors.Blast2galaxyError('Searches with a profile group can not be submitted as a single job, use the blocking search functions instead.')
+
+    _prepare_databases(params)
+    if _is_multi_db(params):
+        raise errors.Blast2galaxyError('Searches in several databases can not be submitted as a single job, use the blocking search functions instead.')
+
+    profile = config.get_profile(profile=params['profile'])
+
+    query = _read_query(params, stream_large_files = not params.get('dedup'))
+    query, query_fanout = _deduplicate_query(params, query)
+
+    result_cache, cache_key = _get_result_cache_key(params, profile, query)
+    blast_result = _get_cached_result(params, result_cache, cache_key)
+    if blast_result is not None:
+        return SearchJob(None, params, None, None, None, None, cached_result = blast_result, query_fanout = query_fanout)
+
+    gi = config.get_galaxy_instance(profile=params['profile'])
+
+    history_id = _get_history_id(gi)
+
+    file_name = f'blast2galaxy_query_{params["tool"]}.fasta'
+    history_id, dataset_id_query, dataset_id_result, job_id = _submit_search(gi, history_id, profile['tool'], params, query, file_name)
+
+    return SearchJob(gi, params, history_id, dataset_id_query, dataset_id_result, job_id, result_cache, cache_key, query_fanout = query_fanout)
+
+
+
+def job_status(job):
+    if job._cached_result is not None:
+        return 'ok'
+    return job._gi.datasets.show_dataset(job.dataset_id_result)['state']
+
+
+
+def job_is_done(job):
+    return job_status(job) in DATASET_TERMINAL_STATES
+
+
+
+def wait_for_job(job, timeout=None, interval=poller.MIN_POLL_INTERVAL):
+    if job._cached_result is not None:
+        return 'ok'
+
+    try:
+        return poller.get_dataset_poller(job._gi).wait(
+            job.history_id,
+            job.dataset_id_result,
+            timeout = timeout if timeout is not None else MAX_WAIT,
+            interval = interval
+        )
+    except TimeoutException:
+        raise errors.Blast2galaxyError(f'The search job {job.job_id} did not finish within {timeout} seconds.')
+
+
+
+def collect(job):
+    """
+    wait for a submitted search to finish, download and process its result and clean up the history
+    """
+    if job.collected:
+        raise errors.Blast2galaxyError(f'The result of the search job {job.job_id} has already been collected.')
+
+    if job._cached_result is not None:
+        blast_result = job._cached_result
+    else:
+        f_result = io.BytesIO()
+        _collect_search(job._gi, job.history_id, job.dataset_id_query, job.dataset_id_result, f_result)
+        blast_result = f_result.getvalue()
+        if job._result_cache is not None:
+            job._result_cache.put(job._cache_key, blast_result)
+    job.collected = True
+
+    return _process_result(job.params, _fan_out(job._query_fanout, blast_result))
+
+
+
+def _fetch_job_states(jobs):
+    """
+    returns the states of the result datasets of the jobs, with one request per Galaxy server and history
+    """
+    states = {}
+    jobs_by_history = {}
+    for job in jobs:
+        if job._cached_result is not None:
+            states[job.dataset_id_result] = 'ok'
+        else:
+            jobs_by_history.setdefault((job._gi, job.history_id), []).append(job)
+
+    for (gi, history_id), history_jobs in jobs_by_history.items():
+        states.update(poller.fetch_states(gi, history_id, [job.dataset_id_result for job in history_jobs]))
+
+    return states
+
+
+
+def as_completed(jobs, interval=poller.MIN_POLL_INTERVAL):
+    """
+    yield the given jobs in the order in which they reach a terminal state
+    """
+    pending = list(jobs)
+    while pending:
+        states = _fetch_job_states(pending)
+        still_pending = []
+        for job in pending:
+            if states[job.dataset_id_result] in DATASET_TERMINAL_STATES:
+                yield job
+            else:
+                still_pending.append(job)
+        pending = still_pending
+        if pending:
+            time.sleep(interval)
+            # jobs which run long are polled less and less often
+            interval = poller.next_interval(interval)
@@ -39,7 +39,7 @@ class ChoicesTaskBlastp(str, StrEnum):
     blastp_short = 'blastp-short'
     blastp_fast = 'blastp-fast'
 
-ChoicesOutfmt = ['0', '2', '4', '5', '6', 'ext', 'json']
+ChoicesOutfmt = ['0', '2', '4', '5', '6', 'ext', 'json', 'ndjson', 'arrow', 'parquet']
 
 class ChoicesOutfmtDiamond(str, StrEnum):
     blast_pairwise = '0'
@@ -2,7 +2,7 @@ class HELP:
     profile = 'ID of the profile as defined in your config TOML. The profile consists of Galaxy server credentials and a Galaxy Tool-ID to be used for your BLAST call'
     query = 'Path / filename of file with nucleotide query sequence(s)'
     task = 'Task type'
-    db = 'Database name'
+    db = 'Database name, or a comma-separated list of database names which are searched concurrently with one upload of the query (tabular output formats only, hits are ranked by e-value and annotated with their database)'
     evalue = 'Expectation value cutoff'
     out = 'Path / filename of file to store the BLAST result'
     outfmt = 'Output format'
@@ -26,4 +26,12 @@ class HELP:
     gapopen = 'Cost to open a gap'
     gapextend = 'Cost to extend a gap'
     comp_based_stats = 'Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally'
-    use_sw_tback = 'Compute locally optimal Smith-Waterman alignments?'
\ No newline at end of file
+    use_sw_tback = 'Compute locally optimal Smith-Waterman alignments?'
+    chunk_size = 'Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs'
+    chunk_residues = 'Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs'
+    chunk_runtime = 'Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs'
+    parallel_jobs = 'Maximum number of concurrently running Galaxy jobs when the query is split into chunks'
+    no_cache = 'Do not use the result cache for this search'
+    dedup = 'Search identical query sequences only once and report the hits for every query ID (tabular output formats only; blastn with --strand both also merges reverse complements)'
+    refresh_cache = 'Ignore a cached result of this search and replace it with the result of a new search'
+    refresh_catalog = 'Fetch the list of tools and databases from the Galaxy server instead of using the cached catalog'
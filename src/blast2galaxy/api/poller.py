@@ -0,0 +1,145 @@
+import threading
+import time
+
+from bioblend import TimeoutException
+from bioblend.galaxy.datasets import TERMINAL_STATES as DATASET_TERMINAL_STATES
+
+
+# the poll interval of a dataset starts at MIN_POLL_INTERVAL seconds and grows by BACKOFF_FACTOR
+# after every poll in which it was not finished, up to MAX_POLL_INTERVAL seconds
+MIN_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 30.0
+BACKOFF_FACTOR = 1.5
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+
+def fetch_states(gi, history_id, dataset_ids):
+    """
+    returns a dict of dataset ID -> state for datasets of one history, fetched with a single history contents request
+    """
+    contents = gi.histories._get(id = history_id, contents = True, params = {'ids': ','.join(dataset_ids)})
+    states = {content['id']: content['state'] for content in contents if content.get('state')}
+
+    for dataset_id in dataset_ids:
+        if dataset_id not in states:
+            # e.g. datasets which are not listed in the contents anymore
+            states[dataset_id] = gi.datasets.show_dataset(dataset_id)['state']
+
+    return states
+
+
+
+def next_interval(interval):
+    return min(interval * BACKOFF_FACTOR, MAX_POLL_INTERVAL)
+
+
+
+class _Waiter:
+    def __init__(self, history_id, dataset_id, interval):
+        self.history_id = history_id
+        self.dataset_id = dataset_id
+        self.interval = interval
+        self.next_poll = time.monotonic() + interval
+        self.state = None
+        self.error = None
+        self.done = threading.Event()
+
+
+
+class DatasetPoller:
+    """
+    Waits for the datasets of a Galaxy server to reach a terminal state. A single background thread polls
+    the states of all awaited datasets of a history with one request, and the poll interval of each dataset
+    grows the longer it runs, so the load on the Galaxy API stays flat with many concurrent searches.
+    """
+    def __init__(self, gi):
+        self.gi = gi
+        self._waiters = []
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def wait(self, history_id, dataset_id, timeout = None, interval = MIN_POLL_INTERVAL):
+        """
+        wait until the dataset reached a terminal state and return that state
+        """
+        waiter = _Waiter(history_id, dataset_id, interval)
+
+        with self._condition:
+            self._waiters.append(waiter)
+            if self._thread is None:
+                self._thread = threading.Thread(target = self._run, name = 'blast2galaxy-poller', daemon = True)
+                self._thread.start()
+            self._condition.notify_all()
+
+        if not waiter.done.wait(timeout):
+            with self._condition:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+            raise TimeoutException(f'Waited too long for dataset {dataset_id} to complete')
+
+        if waiter.error is not None:
+            raise waiter.error
+        return waiter.state
+
+    def _get_due_histories(self):
+        """
+        returns a dict of history ID -> waiters for all histories with a waiter that is due to be polled
+        """
+        now = time.monotonic()
+        due_history_ids = {waiter.history_id for waiter in self._waiters if waiter.next_poll <= now}
+        histories = {}
+        for waiter in self._waiters:
+            if waiter.history_id in due_history_ids:
+                histories.setdefault(waiter.history_id, []).append(waiter)
+        return histories
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._waiters:
+                    self._thread = None
+                    return
+
+                histories = self._get_due_histories()
+                if not histories:
+                    next_poll = min(waiter.next_poll for waiter in self._waiters)
+                    self._condition.wait(max(next_poll - time.monotonic(), 0))
+                    continue
+
+            for history_id, waiters in histories.items():
+                try:
+                    states = fetch_states(self.gi, history_id, [waiter.dataset_id for waiter in waiters])
+                except Exception as e:
+                    states = None
+                    error = e
+
+                with self._condition:
+                    for waiter in waiters:
+                        if states is None:
+                            waiter.error = error
+                        elif states[waiter.dataset_id] in DATASET_TERMINAL_STATES:
+                            waiter.state = states[waiter.dataset_id]
+                        else:
+                            # datasets of long running jobs are polled less and less often
+                            waiter.interval = next_interval(waiter.interval)
+                            waiter.next_poll = time.monotonic() + waiter.interval
+                            continue
+
+                        if waiter in self._waiters:
+                            self._waiters.remove(waiter)
+                        waiter.done.set()
+
+
+
+def get_dataset_poller(gi):
+    """
+    returns the process-wide DatasetPoller of a GalaxyInstance
+    """
+    with _pollers_lock:
+        if gi not in _pollers:
+            _pollers[gi] = DatasetPoller(gi)
+        return _pollers[gi]
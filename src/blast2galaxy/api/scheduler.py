@@ -0,0 +1,69 @@
+import threading
+
+from .. import errors
+
+
+DEFAULT_WEIGHT = 1.0
+
+
+
+class ScheduledServer:
+    """
+    A profile of a profile group together with the weight and concurrency cap of its server
+    """
+    def __init__(self, profile_id, profile, default_max_parallel_jobs):
+        self.profile_id = profile_id
+        self.profile = profile
+        self.weight = float(profile.get('weight', DEFAULT_WEIGHT))
+        self.max_parallel_jobs = max(1, int(profile.get('max_parallel_jobs', default_max_parallel_jobs)))
+        self.running = 0
+        self.assigned = 0
+
+        if self.weight <= 0:
+            raise errors.Blast2galaxyConfigFileError(f'The weight of the server of profile `{profile_id}` must be greater than 0.')
+
+    def __repr__(self):
+        return f'ScheduledServer(profile_id={self.profile_id!r}, weight={self.weight!r}, max_parallel_jobs={self.max_parallel_jobs!r})'
+
+
+
+class ServerScheduler:
+    """
+    Assigns searches to the servers of a profile group. Each search goes to the server with a free job slot
+    that has been assigned the fewest searches relative to its weight, so faster servers which free their
+    slots earlier receive more searches.
+    """
+    def __init__(self, profiles, default_max_parallel_jobs):
+        self.servers = [
+            ScheduledServer(profile_id, profile, default_max_parallel_jobs)
+            for profile_id, profile in profiles.items()
+        ]
+        self._condition = threading.Condition()
+
+    @property
+    def max_parallel_jobs(self):
+        return sum(server.max_parallel_jobs for server in self.servers)
+
+    def acquire(self, exclude = ()):
+        """
+        wait for a free job slot on one of the servers not in `exclude` and return that server
+        """
+        with self._condition:
+            while True:
+                candidates = [server for server in self.servers if server not in exclude]
+                if not candidates:
+                    raise errors.Blast2galaxyError('No server of the profile group is left to run the search on.')
+
+                free_servers = [server for server in candidates if server.running < server.max_parallel_jobs]
+                if free_servers:
+                    server = min(free_servers, key = lambda server: ((server.assigned + 1) / server.weight, -server.weight))
+                    server.running += 1
+                    server.assigned += 1
+                    return server
+
+                self._condition.wait()
+
+    def release(self, server):
+        with self._condition:
+            server.running -= 1
+            self._condition.notify_all()
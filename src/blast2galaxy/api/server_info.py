@@ -1,31 +1,60 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from itertools import compress
 
+from .. import cache
 from .. import config
 from .. import errors
 
-def get_available_tools_and_databases(server = 'default', blast_type = None):
 
-    gi = config.get_galaxy_instance(server=server)
+tool_id_pattern_to_tool_type = {
+    'ncbi_blastn_wrapper': 'blastn',
+    'ncbi_tblastn_wrapper': 'tblastn',
+    'ncbi_blastx_wrapper': 'blastx',
+    'ncbi_blastp_wrapper': 'blastp',
+    'bg_diamond/': 'diamond'
+}
 
-    blast_tool_ids = []
-    blast_tools_databases_dict = {}
+compatible_versions = {
+    'blastn': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
+    'tblastn': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
+    'blastx': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
+    'blastp': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
+    'diamond': ['2.0.15+galaxy0']
+}
 
-    tool_id_pattern_to_tool_type = {
-        'ncbi_blastn_wrapper': 'blastn',
-        'ncbi_tblastn_wrapper': 'tblastn',
-        'ncbi_blastx_wrapper': 'blastx',
-        'ncbi_blastp_wrapper': 'blastp',
-        'bg_diamond/': 'diamond'
-    }
+# default maximum number of concurrent tool detail requests to a single Galaxy server,
+# can be set per server with `max_parallel_requests` in the config TOML
+DEFAULT_MAX_PARALLEL_REQUESTS = 8
+
+_server_semaphores = {}
+_server_semaphores_lock = threading.Lock()
+
+
+
+def _check_blast_type(blast_type):
+    if blast_type and blast_type not in tool_id_pattern_to_tool_type.values():
+        raise errors.Blast2galaxyError(f'The type `{blast_type}` is not implemented in blast2galaxy.')
 
-    compatible_versions = {
-        'blastn': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
-        'tblastn': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
-        'blastx': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
-        'blastp': ['2.10.1+galaxy0', '2.14.1+galaxy0', '2.14.1+galaxy1'],
-        'diamond': ['2.0.15+galaxy0']
+
+
+def _filter_by_blast_type(blast_tools_databases_dict, blast_type = None):
+    if not blast_type:
+        return blast_tools_databases_dict
+
+    return {
+        tool_id: tool_specs for tool_id, tool_specs in blast_tools_databases_dict.items()
+        if tool_specs['tool_name'] == blast_type
     }
 
+
+
+def _select_compatible_tools(tools, blast_type = None):
+    """
+    select the compatible BLAST+ and DIAMOND tools from the tool list of a Galaxy server,
+    returns the IDs of the compatible tools and the tool type of every matching tool ID
+    """
+    blast_tool_ids = []
     tool_name_by_tool_id = {}
 
     if blast_type:
@@ -35,9 +64,7 @@ def get_available_tools_and_databases(server = 'default', blast_type = None):
         else:
             raise errors.Blast2galaxyError(f'The type `{blast_type}` is not implemented in blast2galaxy.')
     else:
-        blast_tool_ids_to_match = tool_id_pattern_to_tool_type.keys()
-
-    tools = gi.tools.get_tools()
+        blast_tool_ids_to_match = list(tool_id_pattern_to_tool_type.keys())
 
     for tool in tools:
         matches = [x in tool['id'] for x in blast_tool_ids_to_match]
@@ -49,35 +76,118 @@ def get_available_tools_and_databases(server = 'default', blast_type = None):
             if tool['version'] in compatible_versions[tool_name]:
                 blast_tool_ids.append(tool['id'])
 
-    for blast_tool_id in blast_tool_ids:
-        blast_tool_details = gi.tools.show_tool(blast_tool_id, io_details=True)
-        blast_tool_databases = {}
-
-        for _input in blast_tool_details['inputs']:
-
-            # NCBI BLAST+
-            if _input['name'] == 'db_opts':
-                for _case in _input['cases']:
-                    if _case['value'] == 'db':
-                        for __input in _case['inputs']:
-                            if __input['name'] == 'database':
-                                for _database in __input['options']:
-                                    blast_tool_databases[_database[1]] = _database[0]
-
-            # DIAMOND
-            if _input['name'] == 'ref_db_source':
-                for _case in _input['cases']:
-                    if _case['value'] == 'indexed':
-                        for __input in _case['inputs']:
-                            if __input['name'] == 'index':
-                                for _database in __input['options']:
-                                    blast_tool_databases[_database[1]] = _database[0]
-        
+    return blast_tool_ids, tool_name_by_tool_id
+
+
+
+def _get_tool_databases(blast_tool_details):
+    """
+    extract the available databases from the details (`show_tool(io_details=True)`) of a BLAST+ or DIAMOND tool
+    """
+    blast_tool_databases = {}
+
+    for _input in blast_tool_details['inputs']:
+
+        # NCBI BLAST+
+        if _input['name'] == 'db_opts':
+            for _case in _input['cases']:
+                if _case['value'] == 'db':
+                    for __input in _case['inputs']:
+                        if __input['name'] == 'database':
+                            for _database in __input['options']:
+                                blast_tool_databases[_database[1]] = _database[0]
+
+        # DIAMOND
+        if _input['name'] == 'ref_db_source':
+            for _case in _input['cases']:
+                if _case['value'] == 'indexed':
+                    for __input in _case['inputs']:
+                        if __input['name'] == 'index':
+                            for _database in __input['options']:
+                                blast_tool_databases[_database[1]] = _database[0]
+
+    return blast_tool_databases
+
+
+
+def get_max_parallel_requests(server_config):
+    return max(1, int(server_config.get('max_parallel_requests', DEFAULT_MAX_PARALLEL_REQUESTS)))
+
 
+
+def _get_server_semaphore(server_config):
+    """
+    returns the process-wide semaphore limiting the concurrent tool detail requests to a Galaxy server
+    """
+    server_url = str(server_config['server_url']).rstrip('/')
+    with _server_semaphores_lock:
+        if server_url not in _server_semaphores:
+            _server_semaphores[server_url] = threading.BoundedSemaphore(get_max_parallel_requests(server_config))
+        return _server_semaphores[server_url]
+
+
+
+def _fetch_available_tools_and_databases(gi, server_config):
+
+    blast_tools_databases_dict = {}
+
+    tools = gi.tools.get_tools()
+
+    blast_tool_ids, tool_name_by_tool_id = _select_compatible_tools(tools)
+
+    if not blast_tool_ids:
+        return blast_tools_databases_dict
+
+    server_semaphore = _get_server_semaphore(server_config)
+
+    def show_tool(blast_tool_id):
+        with server_semaphore:
+            return gi.tools.show_tool(blast_tool_id, io_details=True)
+
+    # fetch the details of all tools concurrently instead of one round trip after another
+    max_workers = min(get_max_parallel_requests(server_config), len(blast_tool_ids))
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        blast_tools_details = list(executor.map(show_tool, blast_tool_ids))
+
+    for blast_tool_id, blast_tool_details in zip(blast_tool_ids, blast_tools_details):
         blast_tools_databases_dict[blast_tool_id] = {
             'tool_name': tool_name_by_tool_id[blast_tool_id],
             'version': blast_tool_details['version'],
-            'available_databases': blast_tool_databases
+            'available_databases': _get_tool_databases(blast_tool_details)
         }
 
-    return blast_tools_databases_dict
\ No newline at end of file
+    return blast_tools_databases_dict
+
+
+
+def get_available_tools_and_databases(server = 'default', blast_type = None, refresh = False):
+    """
+    returns the compatible tools of a Galaxy server with their available databases.
+    The catalog of each server is cached for `catalog_ttl_hours` (see the `[cache]` section of the configuration),
+    `refresh=True` fetches it from the server again.
+    """
+    _check_blast_type(blast_type)
+
+    server_config = config.get_profile(server=server)
+
+    blast_tools_databases_dict = None if refresh else cache.load_catalog(server_config['server_url'])
+
+    if blast_tools_databases_dict is None:
+        gi = config.get_galaxy_instance(server=server)
+        blast_tools_databases_dict = _fetch_available_tools_and_databases(gi, server_config)
+        cache.store_catalog(server_config['server_url'], blast_tools_databases_dict)
+
+    return _filter_by_blast_type(blast_tools_databases_dict, blast_type)
+
+
+
+def get_tool_databases(tool_id, server = 'default', refresh = False):
+    """
+    returns the available databases of a tool on a Galaxy server, or None if the tool is not available there
+    """
+    blast_tools_databases_dict = get_available_tools_and_databases(server = server, refresh = refresh)
+
+    if tool_id not in blast_tools_databases_dict:
+        return None
+
+    return blast_tools_databases_dict[tool_id]['available_databases']
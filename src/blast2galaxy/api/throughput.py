@@ -0,0 +1,120 @@
+import json
+import threading
+
+from .. import cache
+
+
+# weight of the latest observation in the exponentially weighted moving average of the throughput
+EWMA_ALPHA = 0.3
+
+# limits for the number of residues of adaptively sized chunks
+DEFAULT_INITIAL_CHUNK_RESIDUES = 100_000
+MIN_CHUNK_RESIDUES = 1_000
+MAX_CHUNK_RESIDUES = 50_000_000
+
+
+
+def get_throughput_key(server_url, tool_id, db):
+    return f'{str(server_url).rstrip("/")}|{tool_id}|{db}'
+
+
+
+class ThroughputStats:
+    """
+    Residues processed per second by finished jobs, as moving average per server, tool and database.
+    The averages are kept in the cache directory so that following searches start with well-sized chunks.
+    """
+    def __init__(self):
+        self._residues_per_second = None
+        self._lock = threading.Lock()
+
+    def _get_path(self):
+        return cache.get_cache_dir().joinpath('throughput.json')
+
+    def _load(self):
+        if self._residues_per_second is None:
+            try:
+                with open(self._get_path()) as f:
+                    self._residues_per_second = {k: float(v) for k, v in json.load(f).items()}
+            except (OSError, ValueError, AttributeError):
+                self._residues_per_second = {}
+
+    def get(self, key):
+        with self._lock:
+            self._load()
+            return self._residues_per_second.get(key)
+
+    def record(self, key, residues, seconds):
+        if residues <= 0 or seconds <= 0:
+            return
+
+        with self._lock:
+            self._load()
+            observed = residues / seconds
+            previous = self._residues_per_second.get(key)
+            if previous is None:
+                self._residues_per_second[key] = observed
+            else:
+                self._residues_per_second[key] = EWMA_ALPHA * observed + (1 - EWMA_ALPHA) * previous
+
+    def save(self):
+        with self._lock:
+            if self._residues_per_second is None:
+                return
+            try:
+                cache._write_atomic(self._get_path(), json.dumps(self._residues_per_second, indent = 4).encode('utf-8'))
+            except OSError:
+                # the statistics only improve the chunk sizes and are not essential
+                pass
+
+
+throughput_stats = ThroughputStats()
+
+
+
+class AdaptiveChunker:
+    """
+    Splits the records of a multi-FASTA query into chunks on demand, each sized by the latest throughput
+    so that its job takes about `target_runtime` seconds
+    """
+    def __init__(self, records, throughput_key, target_runtime, initial_residues = None, max_sequences = None, stats = throughput_stats):
+        self._records = iter(records)
+        self._next_record = next(self._records, None)
+        self._lock = threading.Lock()
+        self.throughput_key = throughput_key
+        self.target_runtime = target_runtime
+        self.initial_residues = initial_residues or DEFAULT_INITIAL_CHUNK_RESIDUES
+        self.max_sequences = max_sequences
+        self.stats = stats
+
+    def get_chunk_residues(self):
+        residues_per_second = self.stats.get(self.throughput_key)
+        if residues_per_second is None:
+            return self.initial_residues
+        return int(min(max(residues_per_second * self.target_runtime, MIN_CHUNK_RESIDUES), MAX_CHUNK_RESIDUES))
+
+    def next_chunk(self):
+        """
+        returns the next chunk as (FASTA string, residue count), or None when all records have been taken
+        """
+        with self._lock:
+            if self._next_record is None:
+                return None
+
+            max_residues = self.get_chunk_residues()
+            chunk_records = []
+            chunk_residues = 0
+
+            while self._next_record is not None:
+                record, residues = self._next_record
+                chunk_full = (
+                    (self.max_sequences and len(chunk_records) >= self.max_sequences) or
+                    chunk_residues + residues > max_residues
+                )
+                if chunk_records and chunk_full:
+                    break
+                chunk_records.append(record)
+                chunk_residues += residues
+                self._next_record = next(self._records, None)
+
+            return ''.join(chunk_records), chunk_residues
@@ -0,0 +1,260 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from . import config
+from .utils import get_value
+
+
+DEFAULT_MAX_SIZE_MB = 1024
+DEFAULT_MAX_AGE_DAYS = 30
+DEFAULT_CATALOG_TTL_HOURS = 24
+
+# request parameters which do not change the result of a search
+PARAMS_NOT_AFFECTING_RESULT = [
+    'profile', 'query', 'out', 'kwargs', 'outfmt', 'html',
+    'chunk_size', 'chunk_residues', 'chunk_runtime', 'parallel_jobs',
+    'no_cache', 'refresh_cache', 'dedup'
+]
+
+
+
+def get_cache_dir():
+    cache_config = config.get_cache_config()
+
+    if cache_config.get('dir'):
+        return Path(cache_config['dir']).expanduser()
+
+    xdg_cache_home = os.environ.get('XDG_CACHE_HOME')
+    base_dir = Path(xdg_cache_home) if xdg_cache_home else Path.home().joinpath('.cache')
+    return base_dir.joinpath('blast2galaxy')
+
+
+
+def _write_atomic(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp_')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+
+def hash_query(query):
+    return hashlib.sha256(query.replace('\r\n', '\n').strip().encode('utf-8')).hexdigest()
+
+
+
+def hash_query_file(path, block_size = 1024 * 1024):
+    """
+    hash a query file block by block, equal to `hash_query()` of its content
+    """
+    query_hash = hashlib.sha256()
+    started = False
+    pending_whitespace = ''
+
+    # reading in text mode normalizes line endings
+    with open(path) as f:
+        for block in iter(lambda: f.read(block_size), ''):
+            if not started:
+                block = block.lstrip()
+                if not block:
+                    continue
+                started = True
+
+            # hold back trailing whitespace until it is known whether more content follows
+            stripped = block.rstrip()
+            if stripped:
+                query_hash.update((pending_whitespace + stripped).encode('utf-8'))
+                pending_whitespace = block[len(stripped):]
+            else:
+                pending_whitespace += block
+
+    return query_hash.hexdigest()
+
+
+
+def make_result_key(server_url, tool_id, galaxy_outfmt, params, query):
+    """
+    build the content-address of a search result from the server, the tool, the normalized
+    search parameters and a hash of the query sequences (a string or the `Path` of a query file)
+    """
+    normalized_params = {
+        k: str(get_value(v)) for k, v in params.items()
+        if k not in PARAMS_NOT_AFFECTING_RESULT and v is not None
+    }
+    query_hash = hash_query_file(query) if isinstance(query, Path) else hash_query(query)
+
+    key_data = {
+        'server_url': str(server_url).rstrip('/'),
+        'tool_id': str(tool_id),
+        'outfmt': str(galaxy_outfmt),
+        'params': normalized_params,
+        'query': query_hash
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+
+class ResultCache:
+    """
+    Persistent content-addressed cache of raw search results with size- and age-based eviction
+    """
+    def __init__(self, directory, max_size_mb = DEFAULT_MAX_SIZE_MB, max_age_days = DEFAULT_MAX_AGE_DAYS):
+        self.directory = Path(directory)
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self.max_age = max_age_days * 24 * 3600
+
+    def _path(self, key):
+        return self.directory.joinpath(key[:2], key)
+
+    def get_path(self, key):
+        """
+        returns the path of a valid cache entry, or None if there is none
+        """
+        path = self._path(key)
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age:
+                path.unlink(missing_ok=True)
+                return None
+            # mark the entry as recently used
+            os.utime(path)
+        except OSError:
+            return None
+
+        return path
+
+    def get(self, key):
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def put(self, key, data):
+        _write_atomic(self._path(key), data)
+        self.evict()
+
+    @contextmanager
+    def writer(self, key):
+        """
+        context manager yielding a binary file to which an entry can be written piece by piece,
+        the entry becomes visible only if the block finishes without an exception
+        """
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp_')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                yield f
+            os.replace(tmp_path, path)
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+
+        self.evict()
+
+    def _entries(self):
+        entries = []
+        for path in self.directory.glob('*/*'):
+            if path.name.startswith('.tmp_'):
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        remove expired entries and, if the cache is still too large, the least recently used ones
+        """
+        now = time.time()
+        entries = []
+        for mtime, size, path in self._entries():
+            if now - mtime > self.max_age:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for mtime, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total_size -= size
+
+    def clear(self):
+        for _, _, path in self._entries():
+            path.unlink(missing_ok=True)
+
+
+
+def get_result_cache():
+    """
+    returns the result cache if it is enabled in the `[cache]` section of the configuration, otherwise None
+    """
+    cache_config = config.get_cache_config()
+
+    if not cache_config.get('enabled', False):
+        return None
+
+    return ResultCache(
+        directory = get_cache_dir().joinpath('results'),
+        max_size_mb = float(cache_config.get('max_size_mb', DEFAULT_MAX_SIZE_MB)),
+        max_age_days = float(cache_config.get('max_age_days', DEFAULT_MAX_AGE_DAYS))
+    )
+
+
+
+def _get_catalog_path(server_url):
+    server_hash = hashlib.sha256(str(server_url).rstrip('/').encode('utf-8')).hexdigest()[:16]
+    return get_cache_dir().joinpath('catalog', f'{server_hash}.json')
+
+
+
+def load_catalog(server_url):
+    """
+    returns the cached tool and database catalog of a Galaxy server, or None if there is none or it is older than the configured TTL
+    """
+    ttl_hours = float(config.get_cache_config().get('catalog_ttl_hours', DEFAULT_CATALOG_TTL_HOURS))
+    if ttl_hours <= 0:
+        return None
+
+    try:
+        with open(_get_catalog_path(server_url)) as f:
+            catalog = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if catalog.get('server_url') != str(server_url).rstrip('/') or time.time() - catalog.get('created', 0) > ttl_hours * 3600:
+        return None
+
+    return catalog['tools']
+
+
+
+def store_catalog(server_url, tools):
+    ttl_hours = float(config.get_cache_config().get('catalog_ttl_hours', DEFAULT_CATALOG_TTL_HOURS))
+    if ttl_hours <= 0:
+        return
+
+    catalog = {
+        'server_url': str(server_url).rstrip('/'),
+        'created': time.time(),
+        'tools': tools
+    }
+    _write_atomic(_get_catalog_path(server_url), json.dumps(catalog).encode('utf-8'))
@@ -19,7 +19,9 @@ from . import errors
 
 def __invoke_request(params, kwargs):
     if 'calltype' in kwargs and kwargs['calltype'] == 'api':
-        return api.request(params=params)
+        # the Python API can replace the blocking request, e.g. by `api.submit` for the `submit_*` functions
+        handler = kwargs.get('handler', api.request)
+        return handler(params=params)
     else:
         try:
             api.request(params=params)
@@ -78,12 +80,32 @@ def show_config():
 
 
 
+@cli.command()
+def clear_cache():
+    """
+    Remove all search results stored in the result cache
+    """
+    from . import cache
+
+    try:
+        result_cache = cache.ResultCache(cache.get_cache_dir().joinpath('results'))
+        result_cache.clear()
+        Console().print(f'\nCleared the result cache in {result_cache.directory}\n')
+    except errors.Blast2galaxyError as e:
+        e.show()
+
+
+
+
+
 @cli.command()
 @click.option('--server', help='Server-ID as in your config TOML', type=str, default='default', show_default=True)
 @click.option('--type', help='Type of BLAST search', type=click.Choice(ChoicesBlastType, case_sensitive=False), default=None)
+@click.option('--refresh', help=HELP.refresh_catalog, is_flag=True)
 def list_tools(
         server: str = '',
         type: Optional[ChoicesBlastType | None] = None,
+        refresh: Optional[bool] = False,
         **kwargs
     ):
     """
@@ -94,7 +116,8 @@ def list_tools(
     try:
         blast_tools_databases_dict = server_info.get_available_tools_and_databases(
             server = server,
-            blast_type = get_value(type)
+            blast_type = get_value(type),
+            refresh = refresh
         )
         if IS_API_CALL:
             return blast_tools_databases_dict
@@ -125,9 +148,11 @@ def list_tools(
 @cli.command()
 @click.option('--server', help='Server-ID as in your config TOML', type=str, default='default', show_default=True)
 @click.option('--tool', help='Tool-ID of a tool available on the Galaxy server', type=str, required=True)
+@click.option('--refresh', help=HELP.refresh_catalog, is_flag=True)
 def list_dbs(
         server: str = '',
         tool: str = '',
+        refresh: Optional[bool] = False,
         **kwargs
     ):
     """
@@ -135,7 +160,7 @@ def list_dbs(
     """
     tool_id = tool
 
-    blast_tools_databases_dict = server_info.get_available_tools_and_databases(server = server)
+    blast_tools_databases_dict = server_info.get_available_tools_and_databases(server = server, refresh = refresh)
 
     if tool_id in blast_tools_databases_dict:
 
@@ -159,6 +184,26 @@ def list_dbs(
 
 
 
+@cli.command()
+@click.option('--server', help='Server-ID as in your config TOML', type=str, default='default', show_default=True)
+def refresh_catalog(
+        server: str = ''
+    ):
+    """
+    fetch the catalog of available tools and databases of a Galaxy server again and update the cached catalog
+    """
+    try:
+        blast_tools_databases_dict = server_info.get_available_tools_and_databases(server = server, refresh = True)
+    except errors.Blast2galaxyError as e:
+        e.show()
+
+    number_of_databases = sum(len(tool_specs['available_databases']) for tool_specs in blast_tools_databases_dict.values())
+
+    console = Console()
+    console.print(f'\nRefreshed the catalog of the Galaxy server `{server}`: {len(blast_tools_databases_dict)} tools with {number_of_databases} databases\n')
+
+
+
 @cli.command()
 @click.option('--profile', default='default', show_default=True, help = HELP.profile, type=str)
 @click.option('--query', required = True, help = HELP.query, type=str)
@@ -179,6 +224,13 @@ def list_dbs(
 @click.option('--window_size', help=HELP.window_size, type=click.IntRange(1))
 @click.option('--gapopen', help=HELP.gapopen, type=click.IntRange(0))
 @click.option('--gapextend', help=HELP.gapextend, type=click.IntRange(0))
+@click.option('--chunk_size', help=HELP.chunk_size, type=click.IntRange(1))
+@click.option('--chunk_residues', help=HELP.chunk_residues, type=click.IntRange(1))
+@click.option('--parallel_jobs', help=HELP.parallel_jobs, type=click.IntRange(1), default=4, show_default=True)
+@click.option('--no_cache', help=HELP.no_cache, is_flag=True)
+@click.option('--refresh_cache', help=HELP.refresh_cache, is_flag=True)
+@click.option('--dedup', help=HELP.dedup, is_flag=True)
+@click.option('--chunk_runtime', help=HELP.chunk_runtime, type=click.IntRange(1))
 def blastn(
         profile: Optional[str] = '',
         query: str = '',
@@ -199,6 +251,13 @@ def blastn(
         window_size: Optional[int | None] = None,
         gapopen: Optional[int | None] = None,
         gapextend: Optional[int | None] = None,
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
         **kwargs
     ):
     """
@@ -210,7 +269,7 @@ def blastn(
         profile: the profile ID from .blast2galaxy.toml
         query: file path with your query sequence
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a comma-separated list of databases which are searched concurrently
         evalue: Expectation value cutoff
         out: Path / filename of file to store the BLAST result
         outfmt: Output format
@@ -226,6 +285,13 @@ def blastn(
         window_size: Multiple hits window size: use 0 to specify 1-hit algorithm, leave blank for default
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['tool'] = 'blastn'
@@ -267,6 +333,13 @@ def blastn(
 @click.option('--gapopen', help=HELP.gapopen, type=click.IntRange(0))
 @click.option('--gapextend', help=HELP.gapextend, type=click.IntRange(0))
 @click.option('--comp_based_stats', help = HELP.comp_based_stats, type=str, default='2', show_default=True)
+@click.option('--chunk_size', help=HELP.chunk_size, type=click.IntRange(1))
+@click.option('--chunk_residues', help=HELP.chunk_residues, type=click.IntRange(1))
+@click.option('--parallel_jobs', help=HELP.parallel_jobs, type=click.IntRange(1), default=4, show_default=True)
+@click.option('--no_cache', help=HELP.no_cache, is_flag=True)
+@click.option('--refresh_cache', help=HELP.refresh_cache, is_flag=True)
+@click.option('--dedup', help=HELP.dedup, is_flag=True)
+@click.option('--chunk_runtime', help=HELP.chunk_runtime, type=click.IntRange(1))
 def tblastn(
         profile: str = '',
         query: str = '',
@@ -292,6 +365,13 @@ def tblastn(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '2',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
         **kwargs
     ):
     """
@@ -303,7 +383,7 @@ def tblastn(
         profile: the profile ID from .blast2galaxy.toml
         query: file path with your query sequence
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a comma-separated list of databases which are searched concurrently
         evalue: Expectation value cutoff
         out: Path / filename of file to store the BLAST result
         outfmt: Output format
@@ -324,6 +404,13 @@ def tblastn(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['tool'] = 'tblastn'
@@ -358,6 +445,13 @@ def tblastn(
 @click.option('--gapextend', help=HELP.gapextend, type=click.IntRange(0))
 @click.option('--comp_based_stats', help = HELP.comp_based_stats, type=str, default='2', show_default=True)
 @click.option('--use_sw_tback', help=HELP.use_sw_tback, is_flag=True)
+@click.option('--chunk_size', help=HELP.chunk_size, type=click.IntRange(1))
+@click.option('--chunk_residues', help=HELP.chunk_residues, type=click.IntRange(1))
+@click.option('--parallel_jobs', help=HELP.parallel_jobs, type=click.IntRange(1), default=4, show_default=True)
+@click.option('--no_cache', help=HELP.no_cache, is_flag=True)
+@click.option('--refresh_cache', help=HELP.refresh_cache, is_flag=True)
+@click.option('--dedup', help=HELP.dedup, is_flag=True)
+@click.option('--chunk_runtime', help=HELP.chunk_runtime, type=click.IntRange(1))
 def blastp(
         profile: str = '',
         query: str = '',
@@ -383,6 +477,13 @@ def blastp(
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '2',
         use_sw_tback: Optional[bool] = False,
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
         **kwargs
     ):
     """
@@ -394,7 +495,7 @@ def blastp(
         profile: the profile ID from .blast2galaxy.toml
         query: file path with your query sequence
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a comma-separated list of databases which are searched concurrently
         evalue: Expectation value cutoff
         out: Path / filename of file to store the BLAST result
         outfmt: Output format
@@ -415,6 +516,13 @@ def blastp(
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
         use_sw_tback: Compute locally optimal Smith-Waterman alignments?
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['tool'] = 'blastp'
@@ -449,6 +557,13 @@ def blastp(
 @click.option('--gapopen', help=HELP.gapopen, type=click.IntRange(0))
 @click.option('--gapextend', help=HELP.gapextend, type=click.IntRange(0))
 @click.option('--comp_based_stats', help = HELP.comp_based_stats, type=str, default='2', show_default=True)
+@click.option('--chunk_size', help=HELP.chunk_size, type=click.IntRange(1))
+@click.option('--chunk_residues', help=HELP.chunk_residues, type=click.IntRange(1))
+@click.option('--parallel_jobs', help=HELP.parallel_jobs, type=click.IntRange(1), default=4, show_default=True)
+@click.option('--no_cache', help=HELP.no_cache, is_flag=True)
+@click.option('--refresh_cache', help=HELP.refresh_cache, is_flag=True)
+@click.option('--dedup', help=HELP.dedup, is_flag=True)
+@click.option('--chunk_runtime', help=HELP.chunk_runtime, type=click.IntRange(1))
 def blastx(
         profile: str = '',
         query: str = '',
@@ -473,6 +588,13 @@ def blastx(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '2',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
         **kwargs
     ):
     """
@@ -484,7 +606,7 @@ def blastx(
         profile: the profile ID from .blast2galaxy.toml
         query: file path with your query sequence
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a comma-separated list of databases which are searched concurrently
         evalue: Expectation value cutoff
         out: Path / filename of file to store the BLAST result
         outfmt: Output format
@@ -504,6 +626,13 @@ def blastx(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['tool'] = 'blastx'
@@ -540,6 +669,13 @@ def blastx(
 @click.option('--gapopen', help=HELP.gapopen, type=click.IntRange(0))
 @click.option('--gapextend', help=HELP.gapextend, type=click.IntRange(0))
 @click.option('--comp-based-stats', help = HELP.comp_based_stats, type=str, default='1', show_default=True)
+@click.option('--chunk-size', help=HELP.chunk_size, type=click.IntRange(1))
+@click.option('--chunk-residues', help=HELP.chunk_residues, type=click.IntRange(1))
+@click.option('--parallel-jobs', help=HELP.parallel_jobs, type=click.IntRange(1), default=4, show_default=True)
+@click.option('--no-cache', help=HELP.no_cache, is_flag=True)
+@click.option('--refresh-cache', help=HELP.refresh_cache, is_flag=True)
+@click.option('--dedup', help=HELP.dedup, is_flag=True)
+@click.option('--chunk-runtime', help=HELP.chunk_runtime, type=click.IntRange(1))
 def diamond_blastp(
         profile: str = '',
         query: str = '',
@@ -563,6 +699,13 @@ def diamond_blastp(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '1',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
         **kwargs
     ):
     """
@@ -574,7 +717,7 @@ def diamond_blastp(
         profile: the profile ID from .blast2galaxy.toml
         query: file path with your query sequence
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a comma-separated list of databases which are searched concurrently
         evalue: Expectation value cutoff
         out: Path / filename of file to store the BLAST result
         outfmt: Output format
@@ -593,6 +736,13 @@ def diamond_blastp(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['tool'] = 'diamond_blastp'
@@ -628,6 +778,13 @@ def diamond_blastp(
 @click.option('--gapopen', help=HELP.gapopen, type=click.IntRange(0))
 @click.option('--gapextend', help=HELP.gapextend, type=click.IntRange(0))
 @click.option('--comp-based-stats', help = HELP.comp_based_stats, type=str, default='1', show_default=True)
+@click.option('--chunk-size', help=HELP.chunk_size, type=click.IntRange(1))
+@click.option('--chunk-residues', help=HELP.chunk_residues, type=click.IntRange(1))
+@click.option('--parallel-jobs', help=HELP.parallel_jobs, type=click.IntRange(1), default=4, show_default=True)
+@click.option('--no-cache', help=HELP.no_cache, is_flag=True)
+@click.option('--refresh-cache', help=HELP.refresh_cache, is_flag=True)
+@click.option('--dedup', help=HELP.dedup, is_flag=True)
+@click.option('--chunk-runtime', help=HELP.chunk_runtime, type=click.IntRange(1))
 def diamond_blastx(
         profile: str = '',
         query: str = '',
@@ -651,6 +808,13 @@ def diamond_blastx(
         gapopen: Optional[int] = None,
         gapextend: Optional[int] = None,
         comp_based_stats: Optional[str] = '1',
+        chunk_size: Optional[int] = None,
+        chunk_residues: Optional[int] = None,
+        parallel_jobs: Optional[int] = 4,
+        no_cache: Optional[bool] = False,
+        refresh_cache: Optional[bool] = False,
+        dedup: Optional[bool] = False,
+        chunk_runtime: Optional[int] = None,
         **kwargs
     ):
     """
@@ -662,7 +826,7 @@ def diamond_blastx(
         profile: the profile ID from .blast2galaxy.toml
         query: file path with your query sequence
         task: the blastn task: megablast or something
-        db: the BLAST database to search in
+        db: the BLAST database to search in, or a comma-separated list of databases which are searched concurrently
         evalue: Expectation value cutoff
         out: Path / filename of file to store the BLAST result
         outfmt: Output format
@@ -681,6 +845,13 @@ def diamond_blastx(
         gapopen: Cost to open a gap
         gapextend: Cost to extend a gap
         comp_based_stats: Use composition-based statistics: D or d: default (equivalent to 2 ); 0 or F or f: No composition-based statistics; 1: Composition-based statistics as in NAR 29:2994-3005, 2001; 2 or T or t : Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, conditioned on sequence properties; 3: Composition-based score adjustment as in Bioinformatics 21:902-911, 2005, unconditionally
+        chunk_size: Split a multi-FASTA query into chunks of this many sequences which are searched as concurrent Galaxy jobs
+        chunk_residues: Split a multi-FASTA query into chunks of at most this many residues which are searched as concurrent Galaxy jobs
+        parallel_jobs: Maximum number of concurrently running Galaxy jobs when the query is split into chunks
+        no_cache: Do not use the result cache for this search
+        refresh_cache: Ignore a cached result of this search and replace it with the result of a new search
+        dedup: Search identical query sequences only once and report their hits for every query ID
+        chunk_runtime: Size the chunks of a multi-FASTA query adaptively so that each Galaxy job runs about this many seconds, based on the throughput observed for previous jobs
     """
     params = locals()
     params['tool'] = 'diamond_blastx'
@@ -0,0 +1,100 @@
+"""
+conversion of tabular search results (outfmt 6) into typed columnar data with Apache Arrow
+
+Requires the optional dependency `pyarrow` (`pip install blast2galaxy[arrow]`).
+"""
+from . import errors
+from .utils import DATABASE_FIELD, TABULAR_FIELDS
+
+
+# output formats which are written as columnar data
+COLUMNAR_OUTFMTS = ['arrow', 'parquet']
+
+# size in bytes of the blocks in which tabular results are read and converted
+BLOCK_SIZE = 16 * 1024 * 1024
+
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.csv
+    except ImportError:
+        raise errors.Blast2galaxyError('Columnar output requires the optional dependency `pyarrow`. Install it with `pip install blast2galaxy[arrow]`.')
+    return pyarrow
+
+
+
+def get_schema(with_db = False):
+    """
+    returns the Arrow schema of tabular results, with `with_db=True` of merged results of several databases
+    """
+    pa = _import_pyarrow()
+
+    arrow_types = {
+        str: pa.string(),
+        int: pa.int64(),
+        float: pa.float64()
+    }
+    fields = TABULAR_FIELDS + [DATABASE_FIELD] if with_db else TABULAR_FIELDS
+    return pa.schema([(field_name, arrow_types[field_type]) for field_name, field_type in fields])
+
+
+
+def _get_csv_options(with_db = False):
+    pa = _import_pyarrow()
+    schema = get_schema(with_db)
+
+    read_options = pa.csv.ReadOptions(column_names = schema.names, block_size = BLOCK_SIZE)
+    parse_options = pa.csv.ParseOptions(delimiter = '\t', quote_char = False)
+    convert_options = pa.csv.ConvertOptions(column_types = schema, strings_can_be_null = False)
+
+    return read_options, parse_options, convert_options
+
+
+
+def read_tabular(blast_result, with_db = False):
+    """
+    build an Arrow table directly from the bytes of a tabular result
+    """
+    pa = _import_pyarrow()
+
+    if not blast_result.strip():
+        return get_schema(with_db).empty_table()
+
+    read_options, parse_options, convert_options = _get_csv_options(with_db)
+    return pa.csv.read_csv(
+        pa.py_buffer(blast_result),
+        read_options = read_options,
+        parse_options = parse_options,
+        convert_options = convert_options
+    )
+
+
+
+def write_tabular(f_tabular, f_out, file_format, with_db = False):
+    """
+    convert a tabular result block by block from the binary file `f_tabular` and write it
+    to the binary file `f_out` as Arrow IPC file (`arrow`) or Parquet file (`parquet`)
+    """
+    pa = _import_pyarrow()
+    schema = get_schema(with_db)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet
+        writer = pa.parquet.ParquetWriter(f_out, schema)
+    else:
+        writer = pa.ipc.new_file(f_out, schema)
+
+    with writer:
+        if f_tabular.read(1):
+            f_tabular.seek(0)
+            read_options, parse_options, convert_options = _get_csv_options(with_db)
+            reader = pa.csv.open_csv(
+                f_tabular,
+                read_options = read_options,
+                parse_options = parse_options,
+                convert_options = convert_options
+            )
+            for batch in reader:
+                writer.write_batch(batch)
@@ -5,9 +5,8 @@ try:
 except ImportError:
     import tomli as tomllib
 
-from bioblend.galaxy import GalaxyInstance
-
 from . import errors
+from . import session
 
 
 class ConfigHolder:
@@ -17,6 +16,9 @@ class ConfigHolder:
 
 conf = ConfigHolder()
 
+# parsed config TOML files by path, together with the modification time they were parsed at
+_toml_cache = {}
+
 def get_conf():
     return conf.config
 
@@ -62,6 +64,23 @@ def add_profile(profile: str, server: str, tool: str):
     }
 
 
+def add_profile_group(profile_group: str, profiles: list[str]):
+    """
+    add a profile group to the configuration settings, the chunks of a search with a profile group
+    are spread over the servers of its profiles
+
+    Arguments:
+        profile_group: Profile group ID (must be unique and differ from the profile IDs)
+        profiles: IDs of equivalent profiles (the same tool on different servers)
+    """
+    if 'profile_groups' not in conf.config:
+        conf.config['profile_groups'] = {}
+
+    conf.config['profile_groups'][profile_group] = {
+        'profiles': profiles
+    }
+
+
 def add_default_server(server_url: str, api_key: str):
     """
     add a server to the configuration settings
@@ -84,6 +103,23 @@ def add_default_profile(server: str, tool: str):
     add_profile('default', server, tool)
 
 
+def _load_toml(path):
+    """
+    parse a config TOML file, re-using the parsed content as long as the file is not modified
+    """
+    mtime = path.stat().st_mtime_ns
+
+    cached = _toml_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    with open(path, 'rb') as f:
+        config = tomllib.load(f)
+
+    _toml_cache[path] = (mtime, config)
+    return config
+
+
 def load_config_toml():
 
     if conf.config:
@@ -93,19 +129,26 @@ def load_config_toml():
     config_path_home_dir = Path.home().joinpath('.blast2galaxy.toml')
 
     try:
-        with open(config_path_cwd, 'rb') as f:
-            config = tomllib.load(f)
-            return config, config_path_cwd
+        config = _load_toml(config_path_cwd)
+        return config, config_path_cwd
     except FileNotFoundError:
         try:
-            with open(config_path_home_dir, 'rb') as f:
-                config = tomllib.load(f)
-                return config, config_path_home_dir
+            config = _load_toml(config_path_home_dir)
+            return config, config_path_home_dir
         except FileNotFoundError:
             err_msg = f'Could not find the config file  `.blast2galaxy.toml`  in the current working directory or in your home directory: {str(Path.home())}'
             raise errors.Blast2galaxyConfigFileError(err_msg)
 
 
+def get_cache_config():
+    """
+    returns the settings of the optional `[cache]` section of the configuration
+    """
+    config, _ = load_config_toml()
+    return config.get('cache', {})
+
+
+
 def get_profile(server='default', profile=None):
 
     config, _ = load_config_toml()
@@ -142,22 +185,37 @@ def get_profile(server='default', profile=None):
 
 
 
-def get_galaxy_instance(server = 'default', profile=None):
+def get_profile_group(profile_group):
+    """
+    returns the profiles of a profile group (profile ID -> profile merged with its server) from the optional
+    `[profile_groups]` section of the configuration, or None if `profile_group` is not the ID of a profile group
+    """
+    config, _ = load_config_toml()
+
+    if not profile_group or profile_group not in config.get('profile_groups', {}):
+        return None
 
+    profile_ids = config['profile_groups'][profile_group].get('profiles', [])
+    if not profile_ids:
+        raise errors.Blast2galaxyConfigFileError(f'The profile group `{profile_group}` does not contain any profiles.')
+
+    for profile_id in profile_ids:
+        if profile_id not in config.get('profiles', {}):
+            raise errors.Blast2galaxyConfigFileError(f'The profile `{profile_id}` of the profile group `{profile_group}` could not be found in the configuration.')
+
+    return {profile_id: get_profile(profile=profile_id) for profile_id in profile_ids}
+
+
+
+def get_galaxy_instance(server = 'default', profile=None):
+    """
+    returns the pooled Galaxy session of a server or profile,
+    connections and history IDs are re-used by all requests of the process
+    """
     config = get_profile(server=server, profile=profile)
 
     try:
-        if config['api_key']:
-            gi = GalaxyInstance(
-                url = str(config['server_url']),
-                key = str(config['api_key'])
-            )
-        else:
-            gi = GalaxyInstance(
-                url = str(config['server_url']),
-                email = str(config['email']),
-                password = str(config['password'])
-            )
+        gi = session.get_session(config)
 
     except Exception as e:
         raise errors.Blast2galaxyError(f'Could not connect to Galaxy server: {config["server_url"]} ({e})')
@@ -0,0 +1,123 @@
+"""
+deduplication of query sequences and fan-out of the search results onto all original queries
+"""
+import hashlib
+
+from . import errors
+from .utils import iter_fasta_records
+
+
+COMPLEMENT = str.maketrans('ACGTUMRWSYKVHDBN', 'TGCAAKYWSRMBDHVN')
+
+
+
+def reverse_complement(sequence):
+    return sequence.translate(COMPLEMENT)[::-1]
+
+
+
+def _parse_record(record):
+    header, _, sequence = record.partition('\n')
+    header_parts = header[1:].split()
+    query_id = header_parts[0] if header_parts else ''
+    sequence = ''.join(sequence.split()).upper().rstrip('*')
+    return query_id, sequence
+
+
+
+class QueryFanout:
+    """
+    Maps the IDs of the searched unique queries to all original queries with the same sequence
+    and rewrites tabular result lines accordingly
+    """
+    def __init__(self):
+        # query ID of a searched unique query -> list of (original query ID, reverse complemented, sequence length)
+        self.targets = {}
+
+    def rewrite_line(self, line):
+        """
+        returns the lines of all original queries for a tabular result line (bytes) of a searched unique query
+        """
+        line_parts = line.rstrip(b'\r\n').split(b'\t')
+        targets = self.targets.get(line_parts[0].decode('utf-8'))
+
+        if not targets or len(line_parts) < 10:
+            return [line if line.endswith(b'\n') else line + b'\n']
+
+        lines = []
+        for query_id, reverse_complemented, length in targets:
+            parts = list(line_parts)
+            parts[0] = query_id.encode('utf-8')
+            if reverse_complemented:
+                query_start, query_end = int(parts[6]), int(parts[7])
+                parts[6] = str(length - query_end + 1).encode('utf-8')
+                parts[7] = str(length - query_start + 1).encode('utf-8')
+                parts[8], parts[9] = parts[9], parts[8]
+            lines.append(b'\t'.join(parts) + b'\n')
+
+        return lines
+
+    def rewrite(self, blast_result):
+        return b''.join(
+            b''.join(self.rewrite_line(line)) for line in blast_result.splitlines(keepends = True)
+        )
+
+
+
+def deduplicate_fasta(fasta, collapse_reverse_complements = False):
+    """
+    remove queries whose (normalized) sequence occurred before, optionally also reverse complements.
+    Returns the FASTA of the unique queries and the `QueryFanout` to map their results back onto all original queries.
+    """
+    query_fanout = QueryFanout()
+    representatives = {}
+    query_ids = set()
+    unique_records = []
+
+    for record, _ in iter_fasta_records(fasta):
+        query_id, sequence = _parse_record(record)
+
+        if query_id in query_ids:
+            raise errors.Blast2galaxyError(f'The query ID `{query_id}` occurs more than once, deduplication requires unique query IDs.')
+        query_ids.add(query_id)
+
+        canonical_sequence = sequence
+        if collapse_reverse_complements:
+            canonical_sequence = min(sequence, reverse_complement(sequence))
+        sequence_hash = hashlib.sha256(canonical_sequence.encode('utf-8')).digest()
+
+        if sequence_hash in representatives:
+            representative_id, representative_sequence = representatives[sequence_hash]
+            reverse_complemented = sequence != representative_sequence
+            query_fanout.targets[representative_id].append((query_id, reverse_complemented, len(sequence)))
+        else:
+            representatives[sequence_hash] = (query_id, sequence)
+            query_fanout.targets[query_id] = [(query_id, False, len(sequence))]
+            unique_records.append(record)
+
+    return ''.join(unique_records), query_fanout
+
+
+
+class FanoutWriter:
+    """
+    binary file-like object which rewrites a tabular result written to it piece by piece
+    onto all original queries and writes it to `f_out`
+    """
+    def __init__(self, f_out, query_fanout):
+        self.f_out = f_out
+        self.query_fanout = query_fanout
+        self._rest = b''
+
+    def write(self, data):
+        lines = (self._rest + data).split(b'\n')
+        self._rest = lines.pop()
+        for line in lines:
+            if line:
+                self.f_out.write(b''.join(self.query_fanout.rewrite_line(line)))
+        return len(data)
+
+    def close(self):
+        if self._rest:
+            self.f_out.write(b''.join(self.query_fanout.rewrite_line(self._rest)))
+        self._rest = b''
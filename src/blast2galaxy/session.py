@@ -0,0 +1,118 @@
+import json
+import threading
+
+import requests
+from bioblend import ConnectionError
+from bioblend.galaxy import GalaxyInstance
+
+
+# number of connections kept alive per Galaxy server, should be at least the number of concurrently used threads
+CONNECTION_POOL_SIZE = 32
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+
+class GalaxySession(GalaxyInstance):
+    """
+    GalaxyInstance which sends all JSON API requests over one persistent `requests.Session`,
+    so that TCP connections and TLS sessions are reused between requests (HTTP keep-alive).
+    It also remembers the IDs of the histories used by blast2galaxy.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=CONNECTION_POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.history_ids = {}
+
+    def _decode_response(self, r):
+        if r.status_code == 200:
+            try:
+                return r.json()
+            except Exception as e:
+                raise ConnectionError(
+                    f'Request was successful, but cannot decode the response content: {e}',
+                    body=r.content,
+                    status_code=r.status_code,
+                )
+        raise ConnectionError(
+            f'Unexpected HTTP status code: {r.status_code}',
+            body=r.text,
+            status_code=r.status_code,
+        )
+
+    def _send(self, method, url, payload=None, params=None):
+        return self.session.request(
+            method,
+            url,
+            params=params,
+            data=json.dumps(payload) if payload is not None else None,
+            headers=self.json_headers,
+            timeout=self.timeout,
+            allow_redirects=False,
+            verify=self.verify,
+        )
+
+    def make_get_request(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('verify', self.verify)
+        return self.session.get(url, headers=self.json_headers, **kwargs)
+
+    def make_post_request(self, url, payload=None, params=None, files_attached=False):
+        if files_attached:
+            # multipart uploads are rare and handled by bioblend itself
+            return super().make_post_request(url, payload=payload, params=params, files_attached=files_attached)
+        return self._decode_response(self._send('POST', url, payload, params))
+
+    def make_put_request(self, url, payload=None, params=None):
+        return self._decode_response(self._send('PUT', url, payload, params))
+
+    def make_patch_request(self, url, payload=None, params=None):
+        return self._decode_response(self._send('PATCH', url, payload, params))
+
+    def make_delete_request(self, url, payload=None, params=None):
+        return self._send('DELETE', url, payload, params)
+
+
+
+def get_session(server_config):
+    """
+    returns the process-wide GalaxySession for the server and credentials of a server or profile configuration
+    """
+    session_key = (
+        str(server_config['server_url']),
+        str(server_config.get('api_key') or ''),
+        str(server_config.get('email') or '')
+    )
+
+    with _sessions_lock:
+        if session_key not in _sessions:
+            if server_config.get('api_key'):
+                gi = GalaxySession(
+                    url = str(server_config['server_url']),
+                    key = str(server_config['api_key'])
+                )
+            else:
+                gi = GalaxySession(
+                    url = str(server_config['server_url']),
+                    email = str(server_config['email']),
+                    password = str(server_config['password'])
+                )
+            _sessions[session_key] = gi
+
+        return _sessions[session_key]
+
+
+
+def close_sessions():
+    """
+    close all pooled sessions and their connections
+    """
+    with _sessions_lock:
+        for gi in _sessions.values():
+            gi.session.close()
+        _sessions.clear()
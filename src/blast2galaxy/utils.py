@@ -1,3 +1,5 @@
+import json
+import textwrap
 from enum import Enum
 
 def get_value(var):
@@ -7,25 +9,212 @@ def get_value(var):
         return var
 
 
+# names and types of the columns of tabular results (BLAST+ outfmt 6 and DIAMOND outfmt 6 with the default fields)
+TABULAR_FIELDS = [
+    ('query', str),
+    ('contig', str),
+    ('percentage_of_identical_matches', float),
+    ('alignment_length', int),
+    ('number_of_mismatches', int),
+    ('number_of_gap_openings', int),
+    ('start_of_alignment_in_query', int),
+    ('end_of_alignment_in_query', int),
+    ('start_of_alignment_in_subject', int),
+    ('end_of_alignment_in_subject', int),
+    ('e_value', float),
+    ('bit_score', float),
+]
+
+# additional last column of merged results of several databases
+DATABASE_FIELD = ('db', str)
+
+
+def _convert_value(value, field_type):
+    try:
+        return field_type(value)
+    except ValueError:
+        return value
+
+
+def parse_tabular_line(line):
+    """
+    parse a single line of a tabular result into a dict of typed values
+    """
+    line_parts = line.rstrip('\r\n').split('\t')
+    return {
+        field_name: _convert_value(value, field_type)
+        for (field_name, field_type), value in zip(TABULAR_FIELDS + [DATABASE_FIELD], line_parts)
+    }
+
+
+def iter_tabular_hits(tabular):
+    """
+    yield the hits of a tabular result one by one as dicts of typed values.
+    `tabular` can be bytes, a string or any iterable of lines (e.g. a file object).
+    """
+    if isinstance(tabular, (bytes, str)):
+        tabular = tabular.splitlines()
+
+    for line in tabular:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.rstrip('\r\n')
+        if line == '' or line.startswith('#'):
+            continue
+        yield parse_tabular_line(line)
+
+
 def parse_tabular_to_list_of_dict(blast_result):
-    blast_result_list_of_dict = []
-    blast_result_lines = blast_result.decode('utf-8').split('\n')
-    for line in blast_result_lines:
-        if line != "":
-            line_parts = line.split("\t")
-            single_blast_hit = {
-                'contig': line_parts[1],
-                'percentage_of_identical_matches': line_parts[2],
-                'alignment_length': line_parts[3],
-                'number_of_mismatches': line_parts[4],
-                'number_of_gap_openings': line_parts[5],
-                'start_of_alignment_in_query': line_parts[6],
-                'end_of_alignment_in_query': line_parts[7],
-                'start_of_alignment_in_subject': line_parts[8],
-                'end_of_alignment_in_subject': line_parts[9],
-                'e_value': line_parts[10],
-                'bit_score': line_parts[11],
-            }
-            blast_result_list_of_dict.append(single_blast_hit)
-
-    return blast_result_list_of_dict
\ No newline at end of file
+    return list(iter_tabular_hits(blast_result))
+
+
+class TabularJsonWriter:
+    """
+    binary file-like object which converts a tabular result written to it piece by piece into JSON
+    (an array of hits) or NDJSON (one hit per line) and writes it to `f_out`, holding only the current line in memory
+    """
+    def __init__(self, f_out, ndjson=False):
+        self.f_out = f_out
+        self.ndjson = ndjson
+        self._rest = b''
+        self._hits = 0
+
+    def _write_hits(self, lines):
+        for hit in iter_tabular_hits(lines):
+            if self.ndjson:
+                output = json.dumps(hit) + '\n'
+            else:
+                output = ('[\n' if self._hits == 0 else ',\n') + textwrap.indent(json.dumps(hit, indent=4), '    ')
+            self.f_out.write(output.encode('utf-8'))
+            self._hits += 1
+
+    def write(self, data):
+        lines = (self._rest + data).split(b'\n')
+        self._rest = lines.pop()
+        self._write_hits(lines)
+        return len(data)
+
+    def close(self):
+        self._write_hits([self._rest])
+        self._rest = b''
+        if not self.ndjson:
+            self.f_out.write(b'\n]\n' if self._hits else b'[]\n')
+
+
+def iter_query_ids(fasta_lines):
+    """
+    yield the IDs (first word of the header) of the records of a FASTA formatted string or file object
+    """
+    if isinstance(fasta_lines, str):
+        fasta_lines = fasta_lines.splitlines()
+
+    for line in fasta_lines:
+        if line.startswith('>'):
+            header_parts = line[1:].split()
+            yield header_parts[0] if header_parts else ''
+
+
+def _iter_query_groups(f_tabular):
+    """
+    yield (query_id, lines) for each run of consecutive lines of the same query in a binary tabular result file
+    """
+    group_query_id = None
+    group_lines = []
+    for line in f_tabular:
+        if not line.strip() or line.startswith(b'#'):
+            continue
+        query_id = line.split(b'\t', 1)[0]
+        if group_lines and query_id != group_query_id:
+            yield group_query_id, group_lines
+            group_lines = []
+        group_query_id = query_id
+        group_lines.append(line)
+
+    if group_lines:
+        yield group_query_id, group_lines
+
+
+def _get_hit_rank(line_parts):
+    try:
+        return float(line_parts[10]), -float(line_parts[11])
+    except (IndexError, ValueError):
+        return float('inf'), 0.0
+
+
+def merge_ranked_results(result_files, databases, query_ids, f_out):
+    """
+    merge the tabular results of the same queries searched against several databases into one result.
+    The hits of each query are ranked by e-value and bit score and annotated with their database in an additional last column.
+    Only the hits of one query are held in memory at a time.
+    """
+    query_order = {query_id.encode('utf-8'): i for i, query_id in enumerate(query_ids)}
+    query_groups = [_iter_query_groups(f_result) for f_result in result_files]
+    current_groups = [next(groups, None) for groups in query_groups]
+
+    while any(current_groups):
+        candidates = [i for i, group in enumerate(current_groups) if group]
+        first = min(candidates, key = lambda i: query_order.get(current_groups[i][0], len(query_order)))
+        query_id = current_groups[first][0]
+
+        hits = []
+        for i in candidates:
+            if current_groups[i][0] != query_id:
+                continue
+            database = databases[i].encode('utf-8')
+            for line in current_groups[i][1]:
+                line_parts = line.rstrip(b'\r\n').split(b'\t')
+                hits.append((_get_hit_rank(line_parts), b'\t'.join(line_parts + [database]) + b'\n'))
+            current_groups[i] = next(query_groups[i], None)
+
+        hits.sort(key = lambda hit: hit[0])
+        for _, line in hits:
+            f_out.write(line)
+
+
+def iter_fasta_records(fasta):
+    """
+    yield (record, residue_count) tuples for each record of a FASTA formatted string
+    """
+    record_lines = []
+    residues = 0
+    for line in fasta.splitlines(keepends=True):
+        if line.startswith('>') and record_lines:
+            yield ''.join(record_lines), residues
+            record_lines = []
+            residues = 0
+        if line.strip() == '':
+            continue
+        record_lines.append(line if line.endswith('\n') else line + '\n')
+        if not line.startswith('>'):
+            residues += len(line.strip())
+
+    if record_lines:
+        yield ''.join(record_lines), residues
+
+
+def split_fasta(fasta, max_sequences=None, max_residues=None):
+    """
+    split a multi-FASTA string into chunks of at most `max_sequences` records and at most
+    `max_residues` residues. A single record that exceeds `max_residues` forms a chunk of its own.
+    """
+    chunks = []
+    chunk_records = []
+    chunk_residues = 0
+
+    for record, residues in iter_fasta_records(fasta):
+        chunk_full = (
+            (max_sequences and len(chunk_records) >= max_sequences) or
+            (max_residues and chunk_residues + residues > max_residues)
+        )
+        if chunk_records and chunk_full:
+            chunks.append(''.join(chunk_records))
+            chunk_records = []
+            chunk_residues = 0
+
+        chunk_records.append(record)
+        chunk_residues += residues
+
+    if chunk_records:
+        chunks.append(''.join(chunk_records))
+
+    return chunks
@@ -0,0 +1,99 @@
+import os
+import time
+
+import pytest
+
+from blast2galaxy import cache
+from blast2galaxy.cache import ResultCache, make_result_key
+
+
+params = {
+    'profile': 'blastn',
+    'query': 'query.fasta',
+    'out': 'result.txt',
+    'task': 'megablast',
+    'db': 'morex_v3.all.cds',
+    'evalue': '0.001',
+    'outfmt': 'json',
+    'kwargs': {},
+    'tool': 'blastn',
+}
+
+
+def test_result_key_ignores_output_settings():
+    key = make_result_key('https://usegalaxy.eu/', 'ncbi_blastn_wrapper', '6', params, '>q\nACGT\n')
+    other_output = params | {'out': 'other.txt', 'outfmt': '6', 'profile': 'default', 'chunk_size': 10}
+
+    assert key == make_result_key('https://usegalaxy.eu', 'ncbi_blastn_wrapper', '6', other_output, '>q\nACGT')
+
+
+def test_result_key_depends_on_search():
+    key = make_result_key('https://usegalaxy.eu', 'ncbi_blastn_wrapper', '6', params, '>q\nACGT\n')
+
+    assert key != make_result_key('https://usegalaxy.eu', 'ncbi_blastn_wrapper', '6', params | {'db': 'nt'}, '>q\nACGT\n')
+    assert key != make_result_key('https://usegalaxy.eu', 'ncbi_blastn_wrapper', '0', params, '>q\nACGT\n')
+    assert key != make_result_key('https://usegalaxy.eu', 'ncbi_blastn_wrapper', '6', params, '>q\nACGA\n')
+
+
+def test_result_cache_roundtrip_and_age_eviction(tmp_path):
+    result_cache = ResultCache(tmp_path, max_age_days = 1)
+    result_cache.put('ab12', b'result')
+
+    assert result_cache.get('ab12') == b'result'
+    assert result_cache.get('cd34') is None
+
+    two_days_ago = time.time() - 2 * 24 * 3600
+    os.utime(tmp_path / 'ab' / 'ab12', (two_days_ago, two_days_ago))
+
+    assert result_cache.get('ab12') is None
+
+
+def test_result_cache_size_eviction(tmp_path):
+    result_cache = ResultCache(tmp_path, max_size_mb = 1.5)
+    result_cache.put('aa01', b'x' * 1024 * 1024)
+    os.utime(tmp_path / 'aa' / 'aa01', (time.time() - 60, time.time() - 60))
+    result_cache.put('bb02', b'x' * 1024 * 1024)
+
+    assert result_cache.get('aa01') is None
+    assert result_cache.get('bb02') is not None
+
+
+def test_catalog_ttl(tmp_path, monkeypatch):
+    cache_config = {'dir': str(tmp_path), 'catalog_ttl_hours': 1}
+    monkeypatch.setattr(cache.config, 'get_cache_config', lambda: cache_config)
+    catalog = {'ncbi_blastn_wrapper': {'tool_name': 'blastn', 'version': '2.14.1+galaxy0', 'available_databases': {'nt': 'nt'}}}
+
+    cache.store_catalog('https://usegalaxy.eu/', catalog)
+
+    assert cache.load_catalog('https://usegalaxy.eu') == catalog
+    assert cache.load_catalog('https://galaxy.example.org') is None
+
+    cache_config['catalog_ttl_hours'] = 0
+    assert cache.load_catalog('https://usegalaxy.eu') is None
+
+
+
+def test_result_cache_writer(tmp_path):
+    result_cache = ResultCache(tmp_path)
+
+    with result_cache.writer('abcdef') as f:
+        f.write(b'part 1\n')
+        f.write(b'part 2\n')
+    assert result_cache.get('abcdef') == b'part 1\npart 2\n'
+
+    with pytest.raises(RuntimeError):
+        with result_cache.writer('123456') as f:
+            f.write(b'incomplete')
+            raise RuntimeError()
+    assert result_cache.get('123456') is None
+    assert [path.name for _, _, path in result_cache._entries()] == ['abcdef']
+
+
+
+def test_hash_query_file(tmp_path):
+    query = '\n\n>seq1\r\nACGT\r\n>seq2\r\n' + 'ACGT' * 100 + '\r\n\n  \n'
+    path = tmp_path.joinpath('query.fasta')
+    path.write_bytes(query.encode('utf-8'))
+
+    assert cache.hash_query_file(path, block_size = 7) == cache.hash_query(query)
+    assert cache.hash_query_file(path) == cache.hash_query(query)
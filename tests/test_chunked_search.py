@@ -0,0 +1,65 @@
+import io
+import threading
+import time
+
+import pytest
+
+from blast2galaxy import errors
+from blast2galaxy.api import blast_request
+
+
+query = ''.join(f'>seq{i}\nACGTACGTAC\n' for i in range(6))
+
+params = {'tool': 'blastn', 'outfmt': '6', 'chunk_size': 1, 'parallel_jobs': 3}
+
+
+
+class FakeSearches:
+    """
+    stands in for the search of one chunk, later chunks finish first
+    """
+    def __init__(self, failing_query_id = None):
+        self.failing_query_id = failing_query_id
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, gi, history_id, tool_id, params, query, file_name, f_out):
+        query_id = query[1:].split()[0]
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(0.05 * (6 - int(query_id[3:])))
+            if query_id == self.failing_query_id:
+                raise RuntimeError('server down')
+            f_out.write(f'{query_id}\tsubject\n'.encode('utf-8'))
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+
+def test_chunks_run_concurrently_and_are_merged_in_query_order(monkeypatch):
+    searches = FakeSearches()
+    monkeypatch.setattr(blast_request, '_run_search', searches)
+
+    f_out = io.BytesIO()
+    blast_request._run_chunked_search(None, 'h1', 'tool1', params, query, f_out)
+
+    assert f_out.getvalue().decode('utf-8').split() == [word for i in range(6) for word in [f'seq{i}', 'subject']]
+    assert searches.max_running == 3
+
+
+
+def test_failed_chunk(monkeypatch):
+    monkeypatch.setattr(blast_request, '_run_search', FakeSearches(failing_query_id = 'seq2'))
+
+    with pytest.raises(errors.Blast2galaxyError, match = 'chunk 3 of 6 failed: server down'):
+        blast_request._run_chunked_search(None, 'h1', 'tool1', params, query, io.BytesIO())
+
+
+
+def test_non_mergeable_output_formats_are_rejected():
+    with pytest.raises(errors.Blast2galaxyError, match = 'can not be merged'):
+        blast_request._run_chunked_search(None, 'h1', 'tool1', dict(params, outfmt = '5'), query, io.BytesIO())
@@ -0,0 +1,40 @@
+import io
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+from blast2galaxy import columnar
+
+
+tabular = (
+    b'query1\tsubject1\t98.5\t120\t2\t0\t1\t120\t11\t130\t1e-50\t220\n'
+    b'query2\tsubject2\t75.000\t60\t15\t1\t5\t64\t100\t159\t3.2e-05\t45.8\n'
+)
+
+
+
+def test_read_tabular():
+    table = columnar.read_tabular(tabular)
+
+    assert table.schema == columnar.get_schema()
+    assert table.column('query').to_pylist() == ['query1', 'query2']
+    assert table.column('alignment_length').to_pylist() == [120, 60]
+    assert table.column('e_value').to_pylist() == [1e-50, 3.2e-05]
+
+    assert columnar.read_tabular(b'').num_rows == 0
+
+
+
+@pytest.mark.parametrize('file_format', ['arrow', 'parquet'])
+def test_write_tabular(file_format):
+    f_out = io.BytesIO()
+    columnar.write_tabular(io.BytesIO(tabular), f_out, file_format)
+
+    if file_format == 'parquet':
+        import pyarrow.parquet
+        table = pa.parquet.read_table(pa.py_buffer(f_out.getvalue()))
+    else:
+        table = pa.ipc.open_file(pa.py_buffer(f_out.getvalue())).read_all()
+
+    assert table.equals(columnar.read_tabular(tabular))
@@ -0,0 +1,57 @@
+import io
+
+from blast2galaxy.dedup import FanoutWriter, deduplicate_fasta, reverse_complement
+
+
+query = """>a
+ACGTTGCA
+>b isoform of a
+acgt
+tgca
+>c
+GGGAAACC
+>d
+GGTTTCCC
+"""
+
+
+def test_deduplicate_fasta():
+    unique_fasta, query_fanout = deduplicate_fasta(query)
+
+    assert unique_fasta == '>a\nACGTTGCA\n>c\nGGGAAACC\n>d\nGGTTTCCC\n'
+    assert query_fanout.targets['a'] == [('a', False, 8), ('b', False, 8)]
+
+    # d is the reverse complement of c
+    unique_fasta, query_fanout = deduplicate_fasta(query, collapse_reverse_complements = True)
+
+    assert unique_fasta == '>a\nACGTTGCA\n>c\nGGGAAACC\n'
+    assert query_fanout.targets['c'] == [('c', False, 8), ('d', True, 8)]
+
+
+
+def test_reverse_complement():
+    assert reverse_complement('GGGAAACC') == 'GGTTTCCC'
+
+
+
+def test_fanout():
+    _, query_fanout = deduplicate_fasta(query, collapse_reverse_complements = True)
+
+    blast_result = (
+        b'a\ts1\t100.0\t8\t0\t0\t1\t8\t11\t18\t1e-3\t16.0\n'
+        b'c\ts2\t100.0\t5\t0\t0\t2\t6\t100\t105\t1e-2\t12.0\n'
+    )
+    expected = (
+        b'a\ts1\t100.0\t8\t0\t0\t1\t8\t11\t18\t1e-3\t16.0\n'
+        b'b\ts1\t100.0\t8\t0\t0\t1\t8\t11\t18\t1e-3\t16.0\n'
+        b'c\ts2\t100.0\t5\t0\t0\t2\t6\t100\t105\t1e-2\t12.0\n'
+        b'd\ts2\t100.0\t5\t0\t0\t3\t7\t105\t100\t1e-2\t12.0\n'
+    )
+    assert query_fanout.rewrite(blast_result) == expected
+
+    f_out = io.BytesIO()
+    fanout_writer = FanoutWriter(f_out, query_fanout)
+    for i in range(0, len(blast_result), 5):
+        fanout_writer.write(blast_result[i:i+5])
+    fanout_writer.close()
+    assert f_out.getvalue() == expected
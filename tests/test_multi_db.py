@@ -0,0 +1,107 @@
+import io
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from blast2galaxy import errors
+from blast2galaxy.api import blast_request
+
+
+query = '>q1\nACGTACGTAC\n>q2\nACGTACGTAC\n'
+
+results = {
+    'db1': b'q1\ts1\t90.0\t100\t10\t0\t1\t100\t1\t100\t1e-20\t150\n',
+    'db2': b'q1\ts2\t99.0\t100\t1\t0\t1\t100\t1\t100\t1e-40\t190\n',
+    'db3': b'q2\ts3\t99.0\t100\t1\t0\t1\t100\t1\t100\t1e-30\t180\n',
+}
+
+
+
+class FakeSearches:
+    """
+    stands in for the upload, the start of the tool and the download of the result of every database
+    """
+    def __init__(self, failing_database = None):
+        self.failing_database = failing_database
+        self.uploads = 0
+        self.started_databases = []
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def upload_query_into_history(self, gi, history_id, query, file_name):
+        self.uploads += 1
+        return history_id, 'd_query'
+
+    def start_tool(self, gi, history_id, tool_id, params, dataset_id_query):
+        assert dataset_id_query == 'd_query'
+        self.started_databases.append(params['db'])
+        return f'd_{params["db"]}', f'j_{params["db"]}'
+
+    def download_dataset(self, gi, history_id, dataset_id, f_out):
+        database = dataset_id[2:]
+        with self._lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            time.sleep(0.1)
+            if database == self.failing_database:
+                raise RuntimeError('server down')
+            f_out.write(results[database])
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+
+def patch_searches(monkeypatch, searches):
+    monkeypatch.setattr(blast_request, '_upload_query_into_history', searches.upload_query_into_history)
+    monkeypatch.setattr(blast_request, '_start_tool', searches.start_tool)
+    monkeypatch.setattr(blast_request, '_download_dataset', searches.download_dataset)
+
+
+
+def test_query_is_uploaded_once_and_searched_in_every_database(monkeypatch):
+    searches = FakeSearches()
+    patch_searches(monkeypatch, searches)
+    gi = mock.MagicMock()
+    params = {'tool': 'blastn', 'db': 'db1, db2,db3', 'parallel_jobs': 2}
+
+    f_out = io.BytesIO()
+    blast_request._run_multi_db_search(gi, 'h1', 'tool1', params, query, f_out)
+
+    assert searches.uploads == 1
+    assert sorted(searches.started_databases) == ['db1', 'db2', 'db3']
+    assert searches.max_running == 2
+    assert [line.split('\t')[1] + '@' + line.split('\t')[-1] for line in f_out.getvalue().decode('utf-8').splitlines()] == ['s2@db2', 's1@db1', 's3@db3']
+    # the results and finally the query are purged from the history
+    deleted_dataset_ids = [c.kwargs['dataset_id'] for c in gi.histories.delete_dataset.call_args_list]
+    assert sorted(deleted_dataset_ids[:-1]) == ['d_db1', 'd_db2', 'd_db3']
+    assert deleted_dataset_ids[-1] == 'd_query'
+
+
+
+def test_failed_database(monkeypatch):
+    patch_searches(monkeypatch, FakeSearches(failing_database = 'db2'))
+    params = {'tool': 'blastn', 'db': ['db1', 'db2'], 'parallel_jobs': 2}
+
+    with pytest.raises(errors.Blast2galaxyError, match = 'database `db2` failed: server down'):
+        blast_request._run_multi_db_search(mock.MagicMock(), 'h1', 'tool1', params, query, io.BytesIO())
+
+
+
+def test_prepare_databases():
+    params = {'tool': 'blastn', 'db': ' db1 ', 'outfmt': '5', 'html': False}
+    blast_request._prepare_databases(params)
+    assert params['db'] == 'db1'
+
+    with pytest.raises(errors.Blast2galaxyError, match = 'only supported for the tabular output formats'):
+        blast_request._prepare_databases({'tool': 'blastn', 'db': 'db1,db2', 'outfmt': '5', 'html': False})
+
+    with pytest.raises(errors.Blast2galaxyError, match = 'can not be combined with splitting the query'):
+        blast_request._prepare_databases({'tool': 'blastn', 'db': 'db1,db2', 'outfmt': '6', 'html': False, 'chunk_size': 10})
+
+    with pytest.raises(errors.Blast2galaxyError, match = 'No database'):
+        blast_request._prepare_databases({'tool': 'blastn', 'db': ' , '})
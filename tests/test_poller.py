@@ -0,0 +1,67 @@
+import threading
+from unittest import mock
+
+import pytest
+from bioblend import TimeoutException
+
+from blast2galaxy.api import poller
+from blast2galaxy.api.poller import DatasetPoller
+
+
+
+class FakeGalaxy:
+    """
+    history contents whose datasets finish after a given number of state requests
+    """
+    def __init__(self, finished_after):
+        self.finished_after = finished_after
+        self.requests = []
+        self.histories = mock.Mock()
+        self.histories._get.side_effect = self.get_contents
+        self.datasets = mock.Mock()
+
+    def get_contents(self, id, contents, params):
+        self.requests.append(params['ids'].split(','))
+        return [
+            {'id': dataset_id, 'state': 'ok' if len(self.requests) >= self.finished_after[dataset_id] else 'running'}
+            for dataset_id in params['ids'].split(',')
+        ]
+
+
+
+def test_states_of_a_history_are_fetched_together(monkeypatch):
+    monkeypatch.setattr(poller, 'MAX_POLL_INTERVAL', 0.05)
+    gi = FakeGalaxy({f'd{i}': 1 if i < 5 else 3 for i in range(10)})
+    dataset_poller = DatasetPoller(gi)
+
+    states = {}
+    def wait(dataset_id):
+        states[dataset_id] = dataset_poller.wait('h1', dataset_id, timeout = 10, interval = 0.02)
+
+    threads = [threading.Thread(target = wait, args = (f'd{i}',)) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert states == {f'd{i}': 'ok' for i in range(10)}
+    # far fewer requests than datasets, finished datasets are not polled again
+    assert len(gi.requests) <= 4
+    assert all(len(dataset_ids) <= 5 for dataset_ids in gi.requests[1:])
+
+
+
+def test_timeout_and_errors():
+    gi = FakeGalaxy({'d1': 1000})
+    with pytest.raises(TimeoutException):
+        DatasetPoller(gi).wait('h1', 'd1', timeout = 0.1, interval = 0.02)
+
+    gi.histories._get.side_effect = RuntimeError('server down')
+    with pytest.raises(RuntimeError):
+        DatasetPoller(gi).wait('h1', 'd1', timeout = 10, interval = 0.02)
+
+
+
+def test_backoff():
+    assert poller.next_interval(1) == poller.BACKOFF_FACTOR
+    assert poller.next_interval(poller.MAX_POLL_INTERVAL) == poller.MAX_POLL_INTERVAL
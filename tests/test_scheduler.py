@@ -0,0 +1,42 @@
+import pytest
+
+from blast2galaxy import errors
+from blast2galaxy.api.scheduler import ServerScheduler
+
+
+profiles = {
+    'big': {'server_url': 'https://big.example.org', 'tool': 'blastn', 'weight': 3, 'max_parallel_jobs': 6},
+    'small': {'server_url': 'https://small.example.org', 'tool': 'blastn'},
+}
+
+
+
+def test_assignment_follows_weights():
+    server_scheduler = ServerScheduler(profiles, default_max_parallel_jobs = 2)
+    assert server_scheduler.max_parallel_jobs == 8
+
+    assigned = []
+    for _ in range(8):
+        server = server_scheduler.acquire()
+        assigned.append(server.profile_id)
+        server_scheduler.release(server)
+
+    assert assigned.count('big') == 6
+    assert assigned.count('small') == 2
+
+
+
+def test_concurrency_cap_and_exclude():
+    server_scheduler = ServerScheduler(profiles, default_max_parallel_jobs = 1)
+
+    # six job slots on the big server and one on the small server
+    running = [server_scheduler.acquire() for _ in range(7)]
+    assert [server.profile_id for server in running].count('small') == 1
+    assert all(server.running <= server.max_parallel_jobs for server in server_scheduler.servers)
+
+    small_server = [server for server in server_scheduler.servers if server.profile_id == 'small'][0]
+    server_scheduler.release(small_server)
+    assert server_scheduler.acquire().profile_id == 'small'
+
+    with pytest.raises(errors.Blast2galaxyError):
+        server_scheduler.acquire(exclude = server_scheduler.servers)
@@ -0,0 +1,46 @@
+import threading
+import time
+from unittest import mock
+
+from blast2galaxy.api import server_info
+
+
+
+def get_tool_details(tool_id):
+    database_options = [[f'{tool_id} database', f'{tool_id}_db', False]]
+    return {
+        'version': '2.14.1+galaxy0',
+        'inputs': [{'name': 'db_opts', 'cases': [{'value': 'db', 'inputs': [{'name': 'database', 'options': database_options}]}]}]
+    }
+
+
+
+def test_tool_details_are_fetched_concurrently_up_to_the_server_limit():
+    tool_ids = [f'toolshed.g2.bx.psu.edu/repos/devteam/ncbi_blast_plus/ncbi_blastn_wrapper_{i}' for i in range(6)]
+    running = []
+    max_running = []
+    lock = threading.Lock()
+
+    def show_tool(tool_id, io_details = False):
+        with lock:
+            running.append(tool_id)
+            max_running.append(len(running))
+        time.sleep(0.1)
+        with lock:
+            running.remove(tool_id)
+        return get_tool_details(tool_id)
+
+    gi = mock.Mock()
+    gi.tools.get_tools.return_value = [{'id': tool_id, 'version': '2.14.1+galaxy0'} for tool_id in tool_ids]
+    gi.tools.show_tool.side_effect = show_tool
+    server_config = {'server_url': 'https://galaxy.example.org', 'max_parallel_requests': 3}
+
+    catalog = server_info._fetch_available_tools_and_databases(gi, server_config)
+
+    assert max(max_running) == 3
+    assert list(catalog) == tool_ids
+    assert catalog[tool_ids[0]] == {
+        'tool_name': 'blastn',
+        'version': '2.14.1+galaxy0',
+        'available_databases': {f'{tool_ids[0]}_db': f'{tool_ids[0]} database'}
+    }
@@ -0,0 +1,30 @@
+import os
+
+from blast2galaxy import config
+from blast2galaxy import session
+
+
+
+def test_get_session_is_pooled():
+    server_config = {'server_url': 'https://galaxy.example.org', 'api_key': 'abc'}
+
+    gi = session.get_session(server_config)
+    assert session.get_session(dict(server_config)) is gi
+    assert session.get_session({**server_config, 'api_key': 'def'}) is not gi
+
+    session.close_sessions()
+    assert session.get_session(server_config) is not gi
+    session.close_sessions()
+
+
+
+def test_load_toml_is_cached_until_modified(tmp_path):
+    path = tmp_path.joinpath('.blast2galaxy.toml')
+    path.write_text('[servers.default]\nserver_url = "https://a.example.org"\n')
+
+    first = config._load_toml(path)
+    assert config._load_toml(path) is first
+
+    path.write_text('[servers.default]\nserver_url = "https://b.example.org"\n')
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    assert config._load_toml(path)['servers']['default']['server_url'] == 'https://b.example.org'
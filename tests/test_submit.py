@@ -0,0 +1,67 @@
+from unittest import mock
+
+import pytest
+
+from bioblend import TimeoutException
+
+from blast2galaxy import errors
+from blast2galaxy.api import blast_request
+
+
+params = {'tool': 'blastn', 'outfmt': '6', 'out': None, 'kwargs': {'calltype': 'api'}}
+
+
+
+def make_job(gi, dataset_id_result = 'd2'):
+    return blast_request.SearchJob(gi, params, 'h1', 'd1', dataset_id_result, 'j1')
+
+
+
+def test_submitted_search_returns_the_ids_of_its_history_datasets_and_job(monkeypatch):
+    monkeypatch.setattr(blast_request, '_get_tool_inputs', lambda params, dataset_id_query: {})
+    gi = mock.MagicMock()
+    gi.tools.paste_content.return_value = {'outputs': [{'id': 'd1'}]}
+    gi.tools.run_tool.return_value = {'outputs': [{'id': 'd2'}], 'jobs': [{'id': 'j1'}]}
+
+    ids = blast_request._submit_search(gi, 'h1', 'tool1', params, '>seq0\nACGT\n', 'query.fasta')
+
+    assert ids == ('h1', 'd1', 'd2', 'j1')
+    gi.make_get_request.assert_not_called()
+
+
+
+def test_collect_downloads_the_result_once_and_cleans_up():
+    gi = mock.MagicMock()
+    gi.datasets.wait_for_dataset.return_value = {'state': 'ok', 'file_ext': 'tabular', 'download_url': '/api/datasets/d2/display'}
+    gi.make_get_request.return_value.iter_content.return_value = [b'seq0\tsub', b'ject1\n']
+    job = make_job(gi)
+
+    assert blast_request.collect(job) == 'seq0\tsubject1\n'
+    assert gi.histories.delete_dataset.call_count == 2
+
+    with pytest.raises(errors.Blast2galaxyError, match = 'already been collected'):
+        blast_request.collect(job)
+
+
+
+def test_status_and_wait_timeout():
+    gi = mock.MagicMock()
+    gi.datasets.show_dataset.return_value = {'state': 'running'}
+    gi.datasets.wait_for_dataset.side_effect = TimeoutException('timeout')
+    job = make_job(gi)
+
+    assert blast_request.job_status(job) == 'running'
+    assert not blast_request.job_is_done(job)
+    with pytest.raises(errors.Blast2galaxyError, match = 'did not finish within 5 seconds'):
+        blast_request.wait_for_job(job, timeout = 5)
+
+
+
+def test_as_completed_yields_jobs_in_the_order_they_finish():
+    states = {'d2': iter(['running', 'running', 'ok']), 'd3': iter(['running', 'ok'])}
+    gi = mock.MagicMock()
+    gi.datasets.show_dataset.side_effect = lambda dataset_id: {'state': next(states[dataset_id])}
+    slow_job = make_job(gi, 'd2')
+    fast_job = make_job(gi, 'd3')
+
+    assert list(blast_request.as_completed([slow_job, fast_job], interval = 0)) == [fast_job, slow_job]
@@ -0,0 +1,60 @@
+from blast2galaxy.api import throughput
+from blast2galaxy.api.throughput import AdaptiveChunker, ThroughputStats
+from blast2galaxy.utils import iter_fasta_records
+
+
+fasta = ''.join(f'>q{i}\n{"A" * 1000}\n' for i in range(20))
+
+
+
+def make_stats(residues_per_second = None):
+    stats = ThroughputStats()
+    stats._residues_per_second = {}
+    if residues_per_second is not None:
+        stats._residues_per_second['key'] = residues_per_second
+    return stats
+
+
+
+def test_moving_average():
+    stats = make_stats()
+    stats.record('key', 1000, 10)
+    assert stats.get('key') == 100
+    stats.record('key', 2000, 10)
+    assert stats.get('key') == throughput.EWMA_ALPHA * 200 + (1 - throughput.EWMA_ALPHA) * 100
+    stats.record('key', 0, 10)
+    stats.record('key', 1000, 0)
+    assert stats.get('other') is None
+
+
+
+def test_chunks_follow_throughput():
+    stats = make_stats()
+    chunker = AdaptiveChunker(iter_fasta_records(fasta), 'key', target_runtime = 30, initial_residues = 2000, stats = stats)
+
+    chunk, residues = chunker.next_chunk()
+    assert residues == 2000
+    assert chunk.count('>') == 2
+
+    # 200 residues per second for 30 seconds
+    stats.record('key', 6000, 30)
+    chunk, residues = chunker.next_chunk()
+    assert residues == 6000
+
+    stats._residues_per_second['key'] = 1_000_000
+    chunk, residues = chunker.next_chunk()
+    assert residues == 12000
+    assert chunker.next_chunk() is None
+
+
+
+def test_chunk_limits():
+    chunker = AdaptiveChunker(iter_fasta_records(fasta), 'key', target_runtime = 1, max_sequences = 3, stats = make_stats(1))
+
+    # a record larger than the chunk size forms a chunk of its own
+    chunk, residues = chunker.next_chunk()
+    assert chunk.count('>') == 1
+
+    chunker.stats._residues_per_second['key'] = 1_000_000
+    chunk, residues = chunker.next_chunk()
+    assert chunk.count('>') == 3
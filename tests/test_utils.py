@@ -0,0 +1,102 @@
+import io
+import json
+
+from blast2galaxy.utils import TabularJsonWriter, iter_tabular_hits, merge_ranked_results, parse_tabular_to_list_of_dict, split_fasta
+
+
+multi_fasta = """>seq1 first
+ACGTACGTAC
+GTAC
+>seq2
+ACGTAC
+>seq3
+ACGT
+>seq4
+ACGTACGTACGTACGTACGT
+"""
+
+
+def test_split_fasta_by_sequences():
+    chunks = split_fasta(multi_fasta, max_sequences = 3)
+
+    assert len(chunks) == 2
+    assert chunks[0].count('>') == 3
+    assert chunks[1].startswith('>seq4')
+    assert ''.join(chunks) == multi_fasta
+
+
+def test_split_fasta_by_residues():
+    chunks = split_fasta(multi_fasta, max_residues = 14)
+
+    assert [chunk.split('\n')[0] for chunk in chunks] == ['>seq1 first', '>seq2', '>seq4']
+    assert chunks[1].count('>') == 2
+
+
+def test_split_fasta_without_limits():
+    assert split_fasta(multi_fasta) == [multi_fasta]
+
+
+
+tabular = (
+    b'query1\tsubject1\t98.5\t120\t2\t0\t1\t120\t11\t130\t1e-50\t220\n'
+    b'# a comment line\n'
+    b'query2\tsubject2\t75.000\t60\t15\t1\t5\t64\t100\t159\t3.2e-05\t45.8\n'
+)
+
+
+def test_iter_tabular_hits():
+    hits = list(iter_tabular_hits(tabular))
+
+    assert len(hits) == 2
+    assert hits[0]['query'] == 'query1'
+    assert hits[0]['contig'] == 'subject1'
+    assert hits[0]['alignment_length'] == 120
+    assert hits[1]['percentage_of_identical_matches'] == 75.0
+    assert hits[1]['e_value'] == 3.2e-05
+    assert list(iter_tabular_hits(tabular.decode('utf-8'))) == hits
+
+
+
+def test_tabular_json_writer():
+    for ndjson in [False, True]:
+        f_out = io.BytesIO()
+        writer = TabularJsonWriter(f_out, ndjson=ndjson)
+        # write in pieces which split lines
+        for i in range(0, len(tabular), 7):
+            writer.write(tabular[i:i+7])
+        writer.close()
+
+        hits = parse_tabular_to_list_of_dict(tabular)
+        if ndjson:
+            assert f_out.getvalue().decode('utf-8') == ''.join(json.dumps(hit) + '\n' for hit in hits)
+        else:
+            assert f_out.getvalue().decode('utf-8') == json.dumps(hits, indent=4) + '\n'
+
+    f_out = io.BytesIO()
+    TabularJsonWriter(f_out).close()
+    assert json.loads(f_out.getvalue()) == []
+
+
+
+def test_merge_ranked_results():
+    result_db1 = io.BytesIO(
+        b'q1\ts1\t90.0\t100\t10\t0\t1\t100\t1\t100\t1e-20\t150\n'
+        b'q2\ts2\t90.0\t100\t10\t0\t1\t100\t1\t100\t1e-05\t40\n'
+    )
+    result_db2 = io.BytesIO(
+        b'q1\ts3\t99.0\t100\t1\t0\t1\t100\t1\t100\t1e-40\t190\n'
+        b'q1\ts4\t80.0\t100\t20\t0\t1\t100\t1\t100\t1e-20\t160\n'
+        b'q3\ts5\t99.0\t100\t1\t0\t1\t100\t1\t100\t1e-30\t180\n'
+    )
+
+    f_out = io.BytesIO()
+    merge_ranked_results([result_db1, result_db2], ['db1', 'db2'], ['q1', 'q2', 'q3'], f_out)
+
+    hits = parse_tabular_to_list_of_dict(f_out.getvalue())
+    assert [(hit['query'], hit['contig'], hit['db']) for hit in hits] == [
+        ('q1', 's3', 'db2'),
+        ('q1', 's4', 'db2'),
+        ('q1', 's1', 'db1'),
+        ('q2', 's2', 'db1'),
+        ('q3', 's5', 'db2'),
+    ]